@@ -0,0 +1,42 @@
+"""
+Tiempo de importacion de spinsim y de cada submodulo, cada medicion se hace en un proceso nuevo. Tambien se
+indica que dependencias pesadas quedaron cargadas despues de la importacion.
+uso:
+    python -m benchmarks.import_time --repeat 5 --limit 0.5
+"""
+import sys
+import json
+import argparse
+import subprocess
+
+statements = [ "import spinsim", "import spinsim.operators", "import spinsim.hamiltonian",
+    "import spinsim.thermodynamic", "import spinsim.information", "import spinsim.dynamics" ]
+heavy = [ "scipy.sparse", "scipy.sparse.linalg", "mpmath", "dask" ]
+
+script = """
+import sys, time, json
+start = time.perf_counter()
+%s
+seconds = time.perf_counter() - start
+print( json.dumps( { "seconds": seconds, "loaded": [ m for m in %r if m in sys.modules ] } ) )
+"""
+
+
+def measure(statement: str, repeat: int) -> dict:
+    rows = []
+    for _ in range(repeat):
+        output = subprocess.run( [ sys.executable, "-c", script%(statement, heavy) ], check=True, capture_output=True, text=True )
+        rows.append( json.loads(output.stdout) )
+    return { "statement": statement, "seconds": min( r["seconds"] for r in rows ), "loaded": rows[0]["loaded"] }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--limit", type=float, default=None, help="Tiempo maximo de 'import spinsim' en segundos")
+    args = parser.parse_args()
+    results = [ measure(statement, args.repeat) for statement in statements ]
+    for row in results:
+        print( json.dumps(row) )
+    if args.limit is not None and ( results[0]["seconds"] > args.limit or len(results[0]["loaded"]) > 0 ):
+        sys.exit(1)
@@ -0,0 +1,47 @@
+"""
+Comparacion del calculo del calor especifico en serie, en paralelo con una tarea por temperatura
+(mode 'point') y en paralelo por bloques (mode 'chunked').
+uso:
+    python -m benchmarks.parallel_modes --sites 8 --points 100 1000 10000 --workers 4
+"""
+import time
+import json
+import argparse
+import numpy as np
+import spinsim as ss
+
+
+def heisenberg_ring(size: int) -> np.array:
+    terminos = []
+    for op in ss.operators.set_sij_vector([ (i, (i+1)%size) for i in range(size) ], size):
+        terminos += [ [1e-3, op[0]], [1e-3, op[1]], [1e-3, op[2]] ]
+    return ss.hamiltonian.construct_hamiltonian(terminos, [0.5]*size)
+
+
+def run(size: int, points: list, workers: int, scheduler: str) -> list:
+    spectrum = ss.hamiltonian.Spectrum( heisenberg_ring(size) )
+    spectrum.eigvalsh()
+    modes = { "serial": (False, None),
+        "point": (True, { 'scheduler': scheduler, 'num_workers': workers, 'mode': 'point' }),
+        "chunked": (True, { 'scheduler': scheduler, 'num_workers': workers, 'mode': 'chunked' }) }
+
+    results = []
+    for n in points:
+        temp = np.linspace(1, 300, n)
+        for mode, (flag, params) in modes.items():
+            start = time.perf_counter()
+            ss.thermodynamic.specific_heat_workflow(spectrum, temp, 50, flag, params)
+            results.append( { "sites": size, "points": n, "mode": mode, "scheduler": scheduler,
+                "workers": workers, "seconds": time.perf_counter() - start } )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", type=int, default=8)
+    parser.add_argument("--points", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--scheduler", default="threads")
+    args = parser.parse_args()
+    for row in run(args.sites, args.points, args.workers, args.scheduler):
+        print( json.dumps(row) )
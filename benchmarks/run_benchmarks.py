@@ -0,0 +1,98 @@
+"""
+Benchmarks de construccion del hamiltoniano, diagonalizacion, termodinamica y entrelazamiento. Para cada caso se
+mide el tiempo y el pico de memoria (tracemalloc) barriendo el numero de sitios y el valor del spin, el resultado
+se escribe en un archivo JSON para comparar entre versiones.
+uso:
+    python -m benchmarks.run_benchmarks --sites 4 6 8 --spins 0.5 1.0 --output benchmark_results.json
+"""
+import time
+import json
+import argparse
+import platform
+import tracemalloc
+import numpy as np
+import spinsim as ss
+
+
+def heisenberg_ring(size: int) -> list:
+    terminos = []
+    for op in ss.operators.set_sij_vector([ (i, (i+1)%size) for i in range(size) ], size):
+        terminos += [ [1e-3, op[0]], [1e-3, op[1]], [1e-3, op[2]] ]
+    return terminos
+
+
+"""
+Medir el tiempo y el pico de memoria de una funcion, el tiempo se mide sin tracemalloc
+"""
+def measure(func, repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append( time.perf_counter() - start )
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return { "seconds": min(times), "peak_bytes": peak }
+
+
+def cases(size: int, spin: float, temp: np.array, workers: int) -> dict:
+    spins = [ spin ]*size
+    terminos = heisenberg_ring(size)
+    H = ss.hamiltonian.construct_hamiltonian(terminos, spins)
+    M = ss.hamiltonian.construct_term( "Z" + "I"*(size-1), spins )
+    ee, vv = np.linalg.eigh(H)
+    rho = np.outer( vv[:,0], vv[:,0].conj() )
+    point = { 'scheduler': 'threads', 'num_workers': workers, 'mode': 'point' }
+    chunked = { 'scheduler': 'threads', 'num_workers': workers, 'mode': 'chunked' }
+    return {
+        "construct_hamiltonian_dense": lambda: ss.hamiltonian.construct_hamiltonian(terminos, spins),
+        "construct_hamiltonian_sparse": lambda: ss.hamiltonian.construct_hamiltonian(terminos, spins, sparse_flag=True),
+        "eigh": lambda: np.linalg.eigh(H),
+        "specific_heat_serial": lambda: ss.thermodynamic.specific_heat_workflow(H, temp, 50, False, None),
+        "specific_heat_point": lambda: ss.thermodynamic.specific_heat_workflow(H, temp, 50, True, point),
+        "specific_heat_chunked": lambda: ss.thermodynamic.specific_heat_workflow(H, temp, 50, True, chunked),
+        "entropy_serial": lambda: ss.thermodynamic.entropy_workflow(H, temp, 50, False, None),
+        "entropy_point": lambda: ss.thermodynamic.entropy_workflow(H, temp, 50, True, point),
+        "entropy_chunked": lambda: ss.thermodynamic.entropy_workflow(H, temp, 50, True, chunked),
+        "expected_value_serial": lambda: ss.thermodynamic.expected_value_workflow(H, M, temp, 50, False, None),
+        "expected_value_point": lambda: ss.thermodynamic.expected_value_workflow(H, M, temp, 50, True, point),
+        "expected_value_chunked": lambda: ss.thermodynamic.expected_value_workflow(H, M, temp, 50, True, chunked),
+        "partial_trace_lr": lambda: [ ss.information.partial_trace_lr(rho, spins, i) for i in range(size) ],
+        "entanglement_entropy_per_site_gs": lambda: ss.information.entanglement_entropy_per_site_gs(H, spins, False, None),
+    }
+
+
+def run(sites: list, spins: list, points: int, workers: int, repeat: int, max_dim: int) -> list:
+    temp = np.linspace(1, 300, points)
+    results = []
+    for spin in spins:
+        for size in sites:
+            dim = int( (2*spin + 1)**size )
+            if dim > max_dim:
+                continue
+            for name, func in cases(size, spin, temp, workers).items():
+                row = { "benchmark": name, "sites": size, "spin": spin, "dimension": dim, "temperatures": points }
+                row.update( measure(func, repeat) )
+                results.append(row)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", type=int, nargs="+", default=[4, 6, 8])
+    parser.add_argument("--spins", type=float, nargs="+", default=[0.5, 1.0])
+    parser.add_argument("--points", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-dim", type=int, default=4096)
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    results = run(args.sites, args.spins, args.points, args.workers, args.repeat, args.max_dim)
+    report = { "python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(), "results": results }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+    for row in results:
+        print( "%-34s N=%-3d S=%-4.1f D=%-6d %10.5f s %12d B"%( row["benchmark"], row["sites"], row["spin"], row["dimension"], row["seconds"], row["peak_bytes"] ) )
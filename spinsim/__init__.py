@@ -1,4 +1,38 @@
-from spinsim.hamiltonian import *
-from spinsim.operators import *
-from spinsim.thermodynamic import *
-from spinsim.information import *
+import importlib as _importlib
+
+# Los submodulos se cargan al usarlos por primera vez (PEP 562), de forma que import spinsim no carga
+# scipy.sparse, mpmath ni dask
+_submodules = ( "hamiltonian", "operators", "thermodynamic", "information", "dynamics", "instrumentation", "precision" )
+# Submodulos cuyos nombres se exponen en spinsim, los ultimos tienen prioridad igual que con import *
+_exported = ( "hamiltonian", "operators", "thermodynamic", "information", "dynamics" )
+
+
+"""
+Nombres publicos de spinsim, los submodulos y los nombres publicos de los submodulos de _exported. Se usa
+como __all__, por lo que from spinsim import * carga todos los submodulos.
+"""
+def _public_names() -> list:
+    names = list(_submodules) + [ "instrument" ]
+    for sub in _exported:
+        module = _importlib.import_module( "spinsim." + sub )
+        names += [ name for name in vars(module) if not name.startswith("_") ]
+    return list( dict.fromkeys(names) )
+
+
+def __getattr__(name: str):
+    if name in _submodules:
+        return _importlib.import_module( "spinsim." + name )
+    if name == "instrument":
+        return _importlib.import_module( "spinsim.instrumentation" ).instrument
+    if name == "__all__":
+        return _public_names()
+    if not name.startswith("__"):
+        for sub in reversed(_exported):
+            module = _importlib.import_module( "spinsim." + sub )
+            if hasattr(module, name):
+                return getattr(module, name)
+    raise AttributeError( "module 'spinsim' has no attribute '%s'"%name )
+
+
+def __dir__() -> list:
+    return sorted( set( list(globals()) + _public_names() ) )
@@ -0,0 +1 @@
+from .compute_evolution import *
\ No newline at end of file
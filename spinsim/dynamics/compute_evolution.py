@@ -0,0 +1,79 @@
+import numpy as np
+import scipy as sc
+from scipy.sparse.linalg import expm_multiply
+from spinsim import precision
+from spinsim.hamiltonian.build_hamiltonian import construct_sparse_term
+from spinsim.information.compute_information import fidelity_states, von_neumann_entropy, schmidt_values
+
+
+"""
+Funcion que propaga un estado en el tiempo, |psi(t)> = exp(-i H t)|psi(0)>, aplicando expm_multiply entre
+tiempos consecutivos. Es un generador, por lo que solo se guarda el estado actual.
+input:
+    - op: Hamiltoniano (numpy array, matriz sparse o LinearOperator, ver construct_hamiltonian)
+    - state (numpy array): Estado inicial en t = 0
+    - times (numpy array): Tiempos crecientes en los que se entrega el estado (unidades de hbar/energia)
+output:
+    - Tuplas (t, estado) en cada tiempo
+"""
+def evolve_state(op, state: np.array, times: np.array):
+    # Para un LinearOperator no se conoce la traza, con 0 no se desplaza el espectro
+    trace = None if ( isinstance(op, np.ndarray) or sc.sparse.issparse(op) ) else 0.0
+    state = np.asarray(state, dtype=precision.storage_dtype(True))
+    previous = 0.0
+    for t in times:
+        dt = t - previous
+        if dt != 0:
+            state = expm_multiply( -1j*dt*op, state, traceA=trace )
+        previous = t
+        yield t, state
+
+
+"""
+Magnetizacion en z de cada sitio de un estado, se calcula con las probabilidades de la base sin construir
+los operadores
+input:
+    - state (numpy array): Estado del sistema
+    - spin_list (list): Lista con el valor de los espines en cada sitio
+output:
+    - Arreglo con <Sz_i> de cada sitio
+"""
+def site_magnetization(state: np.array, spin_list: list) -> np.array:
+    dims = [ int(2*s + 1) for s in spin_list ]
+    probs = ( np.abs(state)**2 ).reshape(dims)
+    values = []
+    for i, s in enumerate(spin_list):
+        marginal = np.sum( probs, axis=tuple( j for j in range(len(dims)) if j != i ) )
+        values.append( marginal @ ( s - np.arange(dims[i]) ) )
+    return np.array(values)
+
+
+"""
+Funcion que calcula la dinamica despues de un quench, en cada tiempo se entregan los observables sin guardar
+la trayectoria: magnetizacion de cada sitio, eco de Loschmidt |<psi(0)|psi(t)>|**2 (fidelity_states),
+opcionalmente la entropia de entrelazamiento de cada corte de izquierda a derecha (schmidt_values) y el valor
+esperado de otros operadores.
+input:
+    - op: Hamiltoniano despues del quench (numpy array, matriz sparse o LinearOperator)
+    - state (numpy array): Estado inicial
+    - times (numpy array): Tiempos crecientes
+    - spin_list (list): Lista con el valor de los espines en cada sitio
+    - observables (dict): Nombre y operador (matriz densa, sparse o string) de otros valores esperados
+    - entropy_flag (bool): Calcular la entropia de entrelazamiento de cada corte
+output:
+    - Diccionario en cada tiempo con time, magnetization, echo, entropy (si entropy_flag) y los observables
+"""
+def quench_workflow(op, state: np.array, times: np.array, spin_list: list, observables: dict = None, entropy_flag: bool = False):
+    observables = {} if observables is None else observables
+    operators = { name: construct_sparse_term(o, spin_list) if isinstance(o, str) else o for name, o in observables.items() }
+    initial = np.asarray(state, dtype=precision.storage_dtype(True))
+
+    for t, current in evolve_state(op, initial, times):
+        values = { "time": t, "magnetization": site_magnetization(current, spin_list),
+            "echo": fidelity_states(initial, current) }
+        if entropy_flag:
+            values["entropy"] = [ von_neumann_entropy( schmidt_values( current[:, None], [1.0], spin_list, i ) )
+                for i in range( 1, len(spin_list) ) ]
+        for name, operator in operators.items():
+            values[name] = np.real( np.vdot( current, operator @ current ) )
+        yield values
@@ -1 +1,4 @@
-from .build_hamiltonian import *
\ No newline at end of file
+from .build_hamiltonian import *
+from .build_linear_operator import *
+from .build_sectors import *
+from .build_spectrum import *
\ No newline at end of file
@@ -1,5 +1,13 @@
+import threading
 import numpy as np
 import scipy as sc
+from collections import OrderedDict
+from functools import lru_cache
+from types import MappingProxyType
+from spinsim import instrumentation, precision
+cache_size = 512
+# Bytes maximos de las secciones guardadas en cache (ver local_core)
+core_cache_bytes = 2**26
 
 """
 Kronecker delta funcion
@@ -10,8 +18,23 @@ def delta_function(a: int, b: int) -> int:
     return 0
 
 
+"""
+Elementos del operador escalera S+ para spin S, en la base ordenada de m = S a m = -S
+<m+1|S+|m> = sqrt( S(S+1) - m(m+1) ), que se ubican sobre la diagonal principal
+input:
+    - size (int): tamaño de la matriz 2*S + 1
+output:
+    - Arreglo con los size-1 elementos de la diagonal superior
+"""
+def ladder_elements( size: int ) -> np.array:
+    spin = (size-1)/2.0
+    m = spin - np.arange(1, size)
+    return np.sqrt( spin*(spin + 1) - m*(m + 1) )
+
+
 """ 
-Construir las matrices de pauli para spin S
+Construir las matrices de pauli para spin S a partir de los operadores escalera,
+Sx = (S+ + S-)/2, Sy = (S+ - S-)/2i
 input: 
     - size (float): tamaño de la matriz 2*S + 1
 output:
@@ -19,34 +42,43 @@ output:
     - X: pauli I de spin S en formato sparse
     - Y: pauli Y de spin S en formato sparse
     - Z: pauli Z de spin S en formato sparse
+    - +: operador S+ de spin S en formato sparse
+    - -: operador S- de spin S en formato sparse
 """
 def x_matrix( size: int ) -> sc.sparse:
-    spin = (size-1)/2.0
-    base = np.zeros( (size, size) )
-    for a in range(size):
-        for b in range(size):
-            base[a][b] = ( delta_function(a+2,b+1) + delta_function(a+1,b+2) )*np.sqrt( (spin + 1)*(a + b + 1) - (a+1)*(b+1) )
-    return 0.5*sc.sparse.csr_matrix(base)
+    ladder = 0.5*ladder_elements(size)
+    return sc.sparse.diags( [ladder, ladder], [1, -1], shape=(size, size), format='csr' )
 
 def y_matrix( size: int ) -> sc.sparse:
-    spin = (size-1)/2.0
-    base = np.zeros( (size, size) )
-    for a in range(size):
-        for b in range(size):
-            base[a][b] = ( delta_function(a+1,b+2) - delta_function(a+2,b+1) )*np.sqrt( (spin + 1)*(a + b + 1) - (a+1)*(b+1) )
-    return 0.5j*sc.sparse.csr_matrix(base)
+    ladder = 0.5j*ladder_elements(size)
+    return sc.sparse.diags( [-ladder, ladder], [1, -1], shape=(size, size), format='csr' )
 
 def z_matrix( size: int ) -> sc.sparse:
     spin = (size-1)/2.0
-    base = np.zeros( (size, size) )
-    for a in range(size):
-        for b in range(size):
-            base[a][b] = delta_function(a+1,b+1)*(spin +1 - (a+1))
-    return sc.sparse.csr_matrix(base)
+    return sc.sparse.diags( [ spin - np.arange(size) ], [0], shape=(size, size), format='csr' )
 
 def i_matrix( size: int ) -> sc.sparse:
-    base = np.eye( size )
-    return sc.sparse.csr_matrix(base)
+    return sc.sparse.identity( size, format='csr' )
+
+def plus_matrix( size: int ) -> sc.sparse:
+    return sc.sparse.diags( [ ladder_elements(size) ], [1], shape=(size, size), format='csr' )
+
+def minus_matrix( size: int ) -> sc.sparse:
+    return sc.sparse.diags( [ ladder_elements(size) ], [-1], shape=(size, size), format='csr' )
+
+
+# Tabla con las matrices de cada spin, se calcula una sola vez por spin
+spin_table = {}
+
+
+"""
+Marcar una matriz sparse como solo lectura, para que no se pueda modificar la tabla
+"""
+def read_only(matrix: sc.sparse.csr_matrix) -> sc.sparse.csr_matrix:
+    matrix.sort_indices()
+    for array in (matrix.data, matrix.indices, matrix.indptr):
+        array.flags.writeable = False
+    return matrix
 
 
 """ 
@@ -58,11 +90,150 @@ output:
     - X: pauli I de spin S en formato sparse
     - Y: pauli Y de spin S en formato sparse
     - Z: pauli Z de spin S en formato sparse
+    - +: operador S+ de spin S en formato sparse
+    - -: operador S- de spin S en formato sparse
+    - S2: operador S**2 = S(S+1) I en formato sparse
+El diccionario y las matrices son de solo lectura, ya que se comparten desde spin_table.
 """
 def pauli_matrices(spin: float) -> dict:
-    size = int( 2*spin+1 )
-    return { "I": i_matrix(size), "X": x_matrix(size), "Y": y_matrix(size), "Z": z_matrix(size) }
+    if spin not in spin_table:
+        size = int( 2*spin+1 )
+        matrices = { "I": i_matrix(size), "X": x_matrix(size), "Y": y_matrix(size), "Z": z_matrix(size),
+            "+": plus_matrix(size), "-": minus_matrix(size), "S2": spin*(spin + 1)*i_matrix(size) }
+        spin_table[spin] = MappingProxyType( { k: read_only(m) for k, m in matrices.items() } )
+    return spin_table[spin]
+
+
+
+"""
+Matriz identidad usada para rellenar los sitios a la izquierda y derecha de un operador,
+se guarda en cache segun su dimension
+input:
+    - size (int): Dimension de la identidad
+output:
+    - Identidad en formato sparse
+"""
+@lru_cache(maxsize=cache_size)
+def identity_padding(size: int) -> sc.sparse.csr_matrix:
+    return sc.sparse.identity(size, format='csr')
+
+
+"""
+Producto kronecker de la seccion del operador que va desde el primer hasta el ultimo sitio
+distinto de la identidad
+input:
+    - spins (tuple): Valores del spin en cada sitio de la seccion
+    - operator (string): Seccion del operador
+output:
+    - Matriz sparse (csr) de la seccion
+"""
+def kron_section(spins: tuple, operator: str) -> sc.sparse.csr_matrix:
+    result = pauli_matrices(spins[0])[operator[0]]
+    for s, op in zip(spins[1:], operator[1:]):
+        result = sc.sparse.kron(result, pauli_matrices(s)[op], format='csr' )
+
+    # Filtro para limpiar la matriz de terminos imaginarios cuando la cantidad de
+    # operadores 'Y' es par.
+    if operator.count('Y')%2 == 0:
+        result = np.real(result)
+    return sc.sparse.csr_matrix(result)
+
+
+"""
+Bytes de una matriz sparse en formato csr
+"""
+def sparse_bytes(matrix: sc.sparse.csr_matrix) -> int:
+    return int( matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes )
+
+
+# Cache de local_core, se limita por bytes (core_cache_bytes) y no por cantidad de secciones, ya que una
+# seccion larga puede ocupar tanto como el termino completo
+core_cache = OrderedDict()
+core_cache_stats = { "hits": 0, "misses": 0, "bytes": 0 }
+core_cache_lock = threading.Lock()
+
+
+"""
+Seccion del operador (ver kron_section) guardada en cache segun los espines y operadores de la seccion.
+Las secciones que ocupan mas de core_cache_bytes no se guardan, y al superar ese tamaño se descartan las
+secciones usadas hace mas tiempo.
+input:
+    - spins (tuple): Valores del spin en cada sitio de la seccion
+    - operator (string): Seccion del operador
+output:
+    - Matriz sparse (csr) de la seccion, compartida con la cache
+"""
+def local_core(spins: tuple, operator: str) -> sc.sparse.csr_matrix:
+    key = (spins, operator)
+    with core_cache_lock:
+        if key in core_cache:
+            core_cache.move_to_end(key)
+            core_cache_stats["hits"] += 1
+            return core_cache[key]
+        core_cache_stats["misses"] += 1
 
+    result = kron_section(spins, operator)
+    size = sparse_bytes(result)
+    if size <= core_cache_bytes:
+        with core_cache_lock:
+            if key not in core_cache:
+                core_cache[key] = result
+                core_cache_stats["bytes"] += size
+            while core_cache_stats["bytes"] > core_cache_bytes:
+                _, old = core_cache.popitem(last=False)
+                core_cache_stats["bytes"] -= sparse_bytes(old)
+    return result
+
+
+"""
+Estadisticas de las caches usadas al construir los terminos
+output:
+    - Diccionario con los hits, misses y tamaño de cada cache, para local_core tambien los bytes guardados
+    y el maximo (core_cache_bytes)
+"""
+def kron_cache_info() -> dict:
+    return { "spin_table": { "currsize": len(spin_table) },
+        "identity_padding": identity_padding.cache_info()._asdict(),
+        "local_core": dict( core_cache_stats, currsize=len(core_cache), maxbytes=core_cache_bytes ) }
+
+
+"""
+Vaciar las caches usadas al construir los terminos
+"""
+def clear_kron_cache() -> None:
+    identity_padding.cache_clear()
+    with core_cache_lock:
+        core_cache.clear()
+        core_cache_stats.update( hits=0, misses=0, bytes=0 )
+
+
+"""
+Construir matriz sparse asociada al operador ingresado
+input:
+    - operator (string): String que representa el operador, esto debe estar ordenado segun la definicion del problema
+    - spines ([float]): Lista del valor del spin en cada uno de los sitios
+output:
+    - Matriz sparse (csr) que representa el operador ingresado
+"""
+def construct_sparse_term( operator: str, spins: list) -> sc.sparse.csr_matrix:
+    dims = [ int(2*s+1) for s in spins ]
+    sites = [ i for i, op in enumerate(operator) if op != 'I' ]
+    if len(sites) == 0:
+        return identity_padding( int(np.prod(dims)) ).copy()
+
+    # Solo la seccion entre el primer y ultimo operador no trivial requiere productos
+    # kronecker, los extremos son identidades
+    first, last = sites[0], sites[-1]+1
+    left, right = int(np.prod(dims[:first])), int(np.prod(dims[last:]))
+    if left == 1 and right == 1:
+        # La seccion es el termino completo (por ejemplo el enlace (0, N-1) de un anillo), no se guarda en cache
+        return kron_section( tuple(spins), operator )
+    result = local_core( tuple(spins[first:last]), operator[first:last] )
+    if left > 1:
+        result = sc.sparse.kron( identity_padding(left), result, format='csr' )
+    if right > 1:
+        result = sc.sparse.kron( result, identity_padding(right), format='csr' )
+    return result
 
 
 """
@@ -74,21 +245,42 @@ output:
     - Arreglo de numpy que representa el operador ingresado
 """
 def construct_term( operator: str, spins: list) -> np.array:
-    # Diccionario con las matrices de los espines no repetidos
-    spin_system = list( set(spins) )
-    matrices = { s : pauli_matrices(s) for s in spin_system }
-
-    # Construccion del operador mediante una aplicacion consecutiva del
-    # producto kronecker
-    result = matrices[ spins[0] ][operator[0]]
-    for i, op in enumerate(operator[1:]):
-        result = sc.sparse.kron(result, matrices[spins[i+1]][op] )
-    
-    # Filtro para limpiar la matriz de terminos imaginarios cuando la cantidad de
-    # operadores 'Y' es par.
-    if operator.count('Y')%2 == 0:
-        result = np.real(result)
-    return result.toarray()
+    return construct_sparse_term(operator, spins).toarray()
+
+
+"""
+Revisar si un termino es complejo, es decir, si tiene una cantidad impar de operadores 'Y' (por ejemplo los
+terminos de Dzyaloshinskii–Moriya) o un exchange complejo
+"""
+def complex_term(exchange, op: str) -> bool:
+    return op.count('Y')%2 == 1 or np.iscomplexobj(exchange)
+
+
+"""
+Determinar el tipo de dato minimo para representar el hamiltoniano, es real salvo que
+algun termino sea complejo (ver complex_term). La precision es la de almacenamiento de spinsim.precision
+input:
+    - operator ([string]): Lista de string, cada uno representa un operador del hamiltoniano
+output:
+    - dtype de numpy (float32, float64, complex64 o complex128)
+"""
+def infer_dtype(list_operators: list) -> np.dtype:
+    for (exchange, op) in list_operators:
+        if complex_term(exchange, op):
+            return precision.storage_dtype(True)
+    return precision.storage_dtype()
+
+
+"""
+Revisar que un tipo de dato real no se use con terminos complejos, en ese caso la parte imaginaria se
+perderia al construir el hamiltoniano
+"""
+def check_dtype(list_operators: list, dtype) -> None:
+    if np.issubdtype(dtype, np.complexfloating):
+        return
+    for (exchange, op) in list_operators:
+        if op.count('Y')%2 == 1 or np.imag(exchange) != 0:
+            raise ValueError("El termino %s es complejo y no se puede representar con dtype %s"%(op, np.dtype(dtype)))
 
 
 """
@@ -96,14 +288,71 @@ Construir matriz asociada al hamiltoniano ingresado
 input:
     - operator ([string]): Lista de string, cada uno representa un operador del hamiltoniano
     - spines ([float]): Lista del valor del spin en cada uno de los sitios
+    - sparse_flag (bool): Si es verdadero se retorna una matriz sparse (csr) sin construir
+    matrices densas intermedias
+    - dtype (dtype): Tipo de dato del resultado, por defecto se usa infer_dtype. Si es real y algun termino
+    es complejo se lanza ValueError
 output:
-    - Arreglo de numpy que representa el hamiltoniano
+    - Arreglo de numpy (o matriz sparse) que representa el hamiltoniano, las sumas de los terminos se hacen
+    con la precision de acumulacion de spinsim.precision
 """
-def construct_hamiltonian(list_operators: list, spins: list) -> np.array:
-    size = np.prod( 2*np.array(spins)+1 )
-    base = np.zeros( (int(size), int(size)) )
+def construct_hamiltonian(list_operators: list, spins: list, sparse_flag: bool = False, dtype = None) -> np.array:
+    size = int( np.prod( 2*np.array(spins)+1 ) )
+    if dtype is None:
+        dtype = infer_dtype(list_operators)
+    dtype = np.dtype(dtype)
+    check_dtype(list_operators, dtype)
+    real_flag = not np.issubdtype(dtype, np.complexfloating)
+    accumulate = np.result_type( dtype, precision.accumulate_dtype() )
+    # Si la acumulacion tiene mas precision que el resultado, la matriz densa se obtiene de la sparse
+    direct_flag = not sparse_flag and accumulate == dtype
 
-    # Loop para construir cada termino del hamiltoniano
-    for (exchange, op) in list_operators:
-        base = base + exchange*construct_term(op, spins)
+    with instrumentation.stage("construct_hamiltonian", terms=len(list_operators), dimension=size, sparse=sparse_flag) as record:
+        # Cada termino se agrega en formato coo, de forma que nunca se construye
+        # una matriz densa por termino
+        base = np.zeros( (size, size), dtype=dtype ) if direct_flag else None
+        data, rows, cols = [], [], []
+        for (exchange, op) in list_operators:
+            term = construct_sparse_term(op, spins).tocoo()
+            values = exchange*term.data
+            values = np.real(values) if real_flag else values
+            if direct_flag:
+                # Los indices de cada termino son unicos, por lo que la suma es directa
+                base[term.row, term.col] += values
+            else:
+                data.append( values )
+                rows.append( term.row )
+                cols.append( term.col )
+
+        if not direct_flag:
+            if len(data) == 0:
+                base = sc.sparse.csr_matrix( (size, size), dtype=dtype )
+            else:
+                # Los indices repetidos se suman al convertir a csr
+                base = sc.sparse.coo_matrix( (np.concatenate(data).astype(accumulate), (np.concatenate(rows), np.concatenate(cols))), shape=(size, size) )
+                base = base.tocsr().astype(dtype)
+            if not sparse_flag:
+                base = base.toarray()
+        record.add_matrix("hamiltonian", base)
     return base
+
+
+"""
+Diagonalizar un operador hermitiano, acepta matrices densas, sparse y objetos con los metodos
+eigvalsh y eigh (por ejemplo BlockHamiltonian o Spectrum)
+input:
+    - op: Operador hermitiano
+    - vectors_flag (bool): Si es verdadero tambien se retornan los vectores propios
+output:
+    - Valores propios ordenados de menor a mayor (y vectores propios en formato columna)
+"""
+def diagonalize(op, vectors_flag: bool = False):
+    with instrumentation.stage("diagonalize", vectors=vectors_flag) as record:
+        record.add_matrix("operator", op)
+        if hasattr(op, 'eigh'):
+            return op.eigh() if vectors_flag else op.eigvalsh()
+        if sc.sparse.issparse(op):
+            op = op.toarray()
+        if vectors_flag:
+            return np.linalg.eigh(op)
+        return np.linalg.eigvalsh(op)
@@ -0,0 +1,75 @@
+import numpy as np
+from scipy.sparse.linalg import LinearOperator
+from spinsim import precision
+from .build_hamiltonian import pauli_matrices, infer_dtype, check_dtype
+
+
+"""
+Preparar los factores locales de cada termino, solo se guardan los sitios distintos de la identidad.
+Cuando la cantidad de operadores 'Y' es par se usa la parte imaginaria de cada 'Y' y el factor i**n
+se agrega al exchange, de forma que todo el calculo es real.
+input:
+    - operator ([string]): Lista de [exchange, string], cada uno representa un termino del hamiltoniano
+    - spines ([float]): Lista del valor del spin en cada uno de los sitios
+output:
+    - Lista de (exchange, [(sitio, matriz local densa)])
+"""
+def local_factors(list_operators: list, spins: list) -> list:
+    terms = []
+    for (exchange, op) in list_operators:
+        count_y = op.count('Y')
+        factors = []
+        for i, o in enumerate(op):
+            if o == 'I':
+                continue
+            mat = pauli_matrices(spins[i])[o].toarray()
+            if o == 'Y' and count_y%2 == 0:
+                mat = mat.imag
+            factors.append( (i, mat) )
+        if count_y%2 == 0:
+            exchange = exchange*(-1)**(count_y//2)
+        terms.append( (exchange, factors) )
+    return terms
+
+
+"""
+Construir el hamiltoniano como un operador lineal sin almacenar su matriz, cada termino se aplica
+sobre el estado visto como un tensor de forma (d_1, d_2, ..., d_N). Se asume que el hamiltoniano
+es hermitiano.
+input:
+    - operator ([string]): Lista de [exchange, string], cada uno representa un termino del hamiltoniano
+    - spines ([float]): Lista del valor del spin en cada uno de los sitios
+    - dtype (dtype): Tipo de dato del operador, por defecto se usa infer_dtype. Si es real y algun termino
+    es complejo se lanza ValueError
+output:
+    - LinearOperator de scipy que representa el hamiltoniano, las matrices locales se guardan con la precision
+    de dtype y los terminos se suman con la precision de acumulacion de spinsim.precision
+"""
+def construct_linear_operator(list_operators: list, spins: list, dtype = None) -> LinearOperator:
+    dims = tuple( int(2*s+1) for s in spins )
+    size = int( np.prod(dims) )
+    if dtype is None:
+        dtype = infer_dtype(list_operators)
+    dtype = np.dtype(dtype)
+    check_dtype(list_operators, dtype)
+    real_flag = not np.issubdtype(dtype, np.complexfloating)
+    accumulate = np.result_type( dtype, precision.accumulate_dtype() )
+    terms = [ (exchange, [ (site, mat.astype( precision.matching_dtype(mat.dtype, dtype) )) for site, mat in factors ])
+        for exchange, factors in local_factors(list_operators, spins) ]
+
+    def matmat(states: np.array) -> np.array:
+        cols = states.shape[1]
+        psi = states.reshape( dims + (cols,) )
+        out = np.zeros( psi.shape, dtype=np.result_type(accumulate, states.dtype) )
+        for exchange, factors in terms:
+            phi = psi
+            for site, mat in factors:
+                phi = np.moveaxis( np.tensordot(mat, phi, axes=([1], [site])), 0, site )
+            phi = exchange*phi
+            out += np.real(phi) if (real_flag and not np.iscomplexobj(out)) else phi
+        return out.reshape( size, cols ).astype( np.result_type(dtype, states.dtype), copy=False )
+
+    def matvec(state: np.array) -> np.array:
+        return matmat( state.reshape(size, 1) ).ravel()
+
+    return LinearOperator( (size, size), matvec=matvec, rmatvec=matvec, matmat=matmat, rmatmat=matmat, dtype=dtype )
@@ -0,0 +1,202 @@
+import numpy as np
+import scipy as sc
+from .build_hamiltonian import construct_hamiltonian
+
+
+"""
+Calcular el doble de la magnetizacion total (2*Sz) de cada estado de la base, se usa el doble
+para trabajar con enteros cuando hay espines semi enteros
+input:
+    - spines ([float]): Lista del valor del spin en cada uno de los sitios
+output:
+    - Arreglo de enteros con 2*Sz de cada estado de la base
+"""
+def magnetization_values(spins: list) -> np.array:
+    total = np.zeros( 1, dtype=int )
+    for s in spins:
+        # Los elementos de la diagonal de Z van de S a -S
+        local = int(2*s) - 2*np.arange( int(2*s+1) )
+        total = ( total[:, None] + local[None, :] ).ravel()
+    return total
+
+
+"""
+Separar la base en sectores de magnetizacion total
+input:
+    - spines ([float]): Lista del valor del spin en cada uno de los sitios
+output:
+    - Diccionario con 2*Sz como llave y los indices de la base de cada sector
+"""
+def magnetization_sectors(spins: list) -> dict:
+    total = magnetization_values(spins)
+    order = np.argsort( total, kind='stable' )
+    labels, starts = np.unique( total[order], return_index=True )
+    return { int(m): idx for m, idx in zip(labels, np.split(order, starts[1:])) }
+
+
+"""
+Hamiltoniano diagonal por bloques. Cada bloque tiene asociada una base (matriz sparse con columnas
+ortonormales en la base completa) tal que el bloque es B^dagger H B.
+"""
+class BlockHamiltonian:
+    def __init__(self, blocks: dict, bases: dict, size: int):
+        self.blocks = blocks
+        self.bases = bases
+        self.shape = (size, size)
+        self.dtype = np.result_type( *[b.dtype for b in blocks.values()] )
+
+    """
+    Valores propios de todos los bloques ordenados de menor a mayor
+    """
+    def eigvalsh(self) -> np.array:
+        ee = [ np.linalg.eigvalsh(b) for b in self.blocks.values() ]
+        return np.sort( np.concatenate(ee) )
+
+    """
+    Valores y vectores propios de todos los bloques, los vectores propios se escriben en la base completa
+    y se ordenan segun la energia
+    """
+    def eigh(self) -> tuple:
+        ee, vv = [], []
+        for label, block in self.blocks.items():
+            e, v = np.linalg.eigh(block)
+            ee.append( e )
+            vv.append( self.bases[label] @ v )
+        ee, vv = np.concatenate(ee), np.concatenate(vv, axis=1)
+        order = np.argsort( ee, kind='stable' )
+        return ee[order], vv[:, order]
+
+    """
+    Representacion densa del hamiltoniano en la base completa
+    """
+    def toarray(self) -> np.array:
+        base = np.zeros( self.shape, dtype=self.dtype )
+        for label, block in self.blocks.items():
+            basis = self.bases[label]
+            # B h B^dagger = ( B^* (B h)^T )^T, de forma que solo se multiplica sparse por denso
+            base += ( basis.conj() @ (basis @ block).T ).T
+        return base
+
+
+"""
+Matriz sparse que selecciona los indices ingresados de la base completa
+input:
+    - indices (numpy array): Indices de la base que forman el sector
+    - size (int): Dimension de la base completa
+output:
+    - Matriz sparse de tamaño (size, len(indices))
+"""
+def selection_basis(indices: np.array, size: int) -> sc.sparse.csr_matrix:
+    cols = np.arange( indices.shape[0] )
+    return sc.sparse.csr_matrix( (np.ones(indices.shape[0]), (indices, cols)), shape=(size, indices.shape[0]) )
+
+
+"""
+Permutacion de la base asociada a la traslacion de un sitio en un anillo, el estado del sitio j
+pasa al sitio j+1 (modulo N)
+input:
+    - spines ([float]): Lista del valor del spin en cada uno de los sitios, deben ser iguales
+output:
+    - Arreglo perm tal que T|i> = |perm[i]>
+"""
+def translation_permutation(spins: list) -> np.array:
+    if len( set(spins) ) != 1:
+        raise ValueError("La simetria de traslacion requiere que todos los espines sean iguales")
+    dims = tuple( int(2*s+1) for s in spins )
+    digits = np.unravel_index( np.arange( int(np.prod(dims)) ), dims )
+    return np.ravel_multi_index( digits[-1:] + digits[:-1], dims )
+
+
+"""
+Construir las bases de momento de un conjunto de estados cerrado bajo traslaciones. Cada estado
+representativo r (el menor indice de su orbita, con periodo R) genera el estado
+|k,r> = 1/sqrt(R) sum_j exp(-i k j) T^j |r>, que existe solo si k*R es multiplo de 2*pi.
+input:
+    - indices (numpy array): Indices de la base completa cerrados bajo traslaciones
+    - perm (numpy array): Permutacion de translation_permutation
+    - sites (int): Numero de sitios del anillo
+output:
+    - Diccionario con el indice de momento m (k = 2*pi*m/N) como llave y la base sparse de cada sector
+"""
+def momentum_bases(indices: np.array, perm: np.array, sites: int) -> dict:
+    size = perm.shape[0]
+
+    # Orbita de cada estado, se guarda el menor indice y el periodo
+    current = indices.copy()
+    representative = indices.copy()
+    period = np.zeros( indices.shape[0], dtype=int )
+    orbit = [ indices ]
+    for j in range(1, sites+1):
+        current = perm[current]
+        representative = np.minimum( representative, current )
+        period[ (current == indices) & (period == 0) ] = j
+        orbit.append( current )
+
+    own = representative == indices
+    reps, period = indices[own], period[own]
+    orbit = np.array( orbit[:sites] )[:, own]
+
+    bases = {}
+    for m in range(sites):
+        valid = (m*period)%sites == 0
+        if not np.any(valid):
+            continue
+        rows, cols, data = [], [], []
+        for j in range(sites):
+            # Solo los primeros R elementos de la orbita son distintos
+            mask = valid & (j < period)
+            rows.append( orbit[j][mask] )
+            cols.append( np.cumsum(valid)[mask] - 1 )
+            data.append( np.exp( -2j*np.pi*m*j/sites )/np.sqrt( period[mask] ) )
+        rows, cols, data = np.concatenate(rows), np.concatenate(cols), np.concatenate(data)
+        bases[m] = sc.sparse.csr_matrix( (data, (rows, cols)), shape=(size, int(np.sum(valid))) )
+    return bases
+
+
+"""
+Construir el hamiltoniano diagonal por bloques usando la conservacion de la magnetizacion total
+y/o la simetria de traslacion de un anillo, el hamiltoniano se construye en formato sparse y se
+proyecta en cada sector
+input:
+    - operator ([string]): Lista de [exchange, string], cada uno representa un termino del hamiltoniano
+    - spines ([float]): Lista del valor del spin en cada uno de los sitios
+    - tol (float): Tolerancia para considerar que el hamiltoniano rompe una simetria
+    - sz_flag (bool): Separar en sectores de magnetizacion total
+    - translation_flag (bool): Separar en sectores de momento, requiere espines iguales y un hamiltoniano
+    invariante bajo traslaciones (por ejemplo un anillo con enlaces (i, (i+1)%N))
+output:
+    - BlockHamiltonian con un bloque por sector, las llaves son 2*Sz, m (k = 2*pi*m/N) o (2*Sz, m)
+"""
+def construct_block_hamiltonian(list_operators: list, spins: list, tol: float = 1e-12, sz_flag: bool = True, translation_flag: bool = False) -> BlockHamiltonian:
+    ham = construct_hamiltonian(list_operators, spins, sparse_flag=True).tocoo()
+    size = ham.shape[0]
+
+    # Revisar que el hamiltoniano conserve la magnetizacion total
+    if sz_flag:
+        total = magnetization_values(spins)
+        mixing = total[ham.row] != total[ham.col]
+        if np.any( np.abs(ham.data[mixing]) > tol ):
+            raise ValueError("El hamiltoniano no conserva la magnetizacion total")
+        sectors = magnetization_sectors(spins)
+    else:
+        sectors = { None: np.arange(size) }
+
+    ham = ham.tocsr()
+    blocks, bases = {}, {}
+    if not translation_flag:
+        for label, idx in sectors.items():
+            blocks[label] = ham[idx][:, idx].toarray()
+            bases[label] = selection_basis(idx, size)
+        return BlockHamiltonian(blocks, bases, size)
+
+    # Revisar que el hamiltoniano sea invariante bajo traslaciones
+    perm = translation_permutation(spins)
+    if np.any( np.abs( (ham[perm][:, perm] - ham).data ) > tol ):
+        raise ValueError("El hamiltoniano no es invariante bajo traslaciones")
+
+    for label, idx in sectors.items():
+        for m, basis in momentum_bases(idx, perm, len(spins)).items():
+            key = m if label is None else (label, m)
+            blocks[key] = ( basis.conj().T @ ham @ basis ).toarray()
+            bases[key] = basis
+    return BlockHamiltonian(blocks, bases, size)
@@ -0,0 +1,171 @@
+import os
+import json
+import hashlib
+import numpy as np
+from spinsim import instrumentation, precision
+from .build_hamiltonian import construct_hamiltonian, diagonalize
+from .build_sectors import construct_block_hamiltonian
+# Tamaño maximo en bytes de cada bloque de columnas al leer o escribir arreglos en disco
+block_bytes = 2**26
+
+
+"""
+Espectro de un operador hermitiano, la diagonalizacion se hace una sola vez y se reutiliza en todos
+los workflows (tiene los metodos eigvalsh y eigh, por lo que se puede usar en lugar del operador).
+Si solo se calcularon los valores propios y luego se piden los vectores, se diagonaliza de nuevo.
+"""
+class Spectrum:
+    def __init__(self, op = None, values: np.array = None, vectors: np.array = None):
+        if op is None and values is None:
+            raise ValueError("Se necesita un operador o sus valores propios")
+        self.op = op
+        self.values = values
+        self.vectors = vectors
+        size = op.shape[0] if op is not None else values.shape[0]
+        self.shape = (size, size)
+
+    """
+    Valores propios ordenados de menor a mayor
+    """
+    def eigvalsh(self) -> np.array:
+        if self.values is None:
+            self.values = diagonalize(self.op)
+        return self.values
+
+    """
+    Valores y vectores propios, los vectores en formato columna
+    """
+    def eigh(self) -> tuple:
+        if self.vectors is None:
+            if self.op is None:
+                raise ValueError("El espectro no tiene vectores propios ni operador para calcularlos")
+            self.values, self.vectors = diagonalize(self.op, True)
+        return self.values, self.vectors
+
+    """
+    Guardar el espectro en archivos .npy (path_values.npy y path_vectors.npy). Cada archivo se escribe en un
+    temporal que luego se reemplaza, y los valores se escriben al final, ya que su existencia indica que el
+    espectro esta completo (ver construct_spectrum). Los vectores se guardan en orden de columnas, de forma que
+    al cargarlos como memmap cada bloque de columnas (ver column_blocks) se lee de forma contigua
+    """
+    def save(self, path: str) -> None:
+        if self.vectors is not None:
+            save_array( path + "_vectors.npy", self.vectors, True )
+        save_array( path + "_values.npy", self.eigvalsh() )
+
+    """
+    Cargar un espectro guardado con save, con mmap_flag los arreglos se leen como memmap
+    """
+    @staticmethod
+    def load(path: str, mmap_flag: bool = False):
+        mode = 'r' if mmap_flag else None
+        values = np.load( path + "_values.npy", mmap_mode=mode )
+        vectors = None
+        if os.path.exists( path + "_vectors.npy" ):
+            vectors = np.load( path + "_vectors.npy", mmap_mode=mode )
+        return Spectrum(values=values, vectors=vectors)
+
+
+"""
+Separar las columnas de una matriz en bloques de a lo mas block_bytes
+input:
+    - rows (int): Cantidad de filas de la matriz
+    - cols (int): Cantidad de columnas de la matriz
+    - itemsize (int): Bytes de cada elemento
+output:
+    - Lista de slices, uno por bloque de columnas
+"""
+def column_blocks(rows: int, cols: int, itemsize: int) -> list:
+    width = max( 1, block_bytes//max(1, rows*itemsize) )
+    return [ slice(start, min(start + width, cols)) for start in range(0, cols, width) ]
+
+
+"""
+Guardar un arreglo de dos dimensiones en un archivo .npy (orden de columnas) y abrirlo como memmap de solo
+lectura, de forma que se puede liberar el arreglo en memoria y leer por bloques de columnas
+input:
+    - array (numpy array): Arreglo a guardar, por ejemplo los vectores propios en formato columna
+    - path (string): Ruta del archivo .npy
+output:
+    - memmap de solo lectura con el contenido del arreglo
+"""
+def store_array(array: np.array, path: str) -> np.memmap:
+    stored = np.lib.format.open_memmap( path, mode='w+', dtype=array.dtype, shape=array.shape, fortran_order=True )
+    for cols in column_blocks( array.shape[0], array.shape[1], array.dtype.itemsize ):
+        stored[:, cols] = array[:, cols]
+    stored.flush()
+    del stored
+    return np.load( path, mmap_mode='r' )
+
+
+"""
+Guardar un arreglo en un archivo .npy de forma atomica, se escribe en un temporal y se reemplaza con os.replace,
+de forma que otro proceso nunca lee un archivo incompleto
+input:
+    - path (string): Ruta del archivo .npy
+    - array (numpy array): Arreglo a guardar
+    - columns_flag (bool): Si es verdadero el arreglo (de dos dimensiones) se guarda en orden de columnas por
+    bloques (ver store_array)
+"""
+def save_array(path: str, array: np.array, columns_flag: bool = False) -> None:
+    temporal = "%s.%d.tmp"%(path, os.getpid())
+    if columns_flag:
+        store_array(array, temporal)
+    else:
+        with open(temporal, "wb") as f:
+            np.save(f, array)
+    os.replace(temporal, path)
+
+
+"""
+Calcular una llave (sha256) que identifica al hamiltoniano a partir de sus terminos, espines y la precision de
+almacenamiento de spinsim.precision
+input:
+    - operator ([string]): Lista de [exchange, string], cada uno representa un termino del hamiltoniano
+    - spines ([float]): Lista del valor del spin en cada uno de los sitios
+output:
+    - String hexadecimal con la llave
+"""
+def spectrum_key(list_operators: list, spins: list) -> str:
+    content = json.dumps( [ [ [repr(exchange), op] for (exchange, op) in list_operators ], [repr(s) for s in spins],
+        str(precision.policy["storage"]) ] )
+    return hashlib.sha256( content.encode() ).hexdigest()
+
+
+"""
+Construir el espectro de un hamiltoniano, opcionalmente guardado en disco. Si store_dir contiene
+un espectro con la misma llave (ver spectrum_key) se carga sin diagonalizar.
+input:
+    - operator ([string]): Lista de [exchange, string], cada uno representa un termino del hamiltoniano
+    - spines ([float]): Lista del valor del spin en cada uno de los sitios
+    - vectors_flag (bool): Si es verdadero tambien se calculan los vectores propios
+    - store_dir (string): Carpeta donde se guardan los espectros, None para no usar disco
+    - mmap_flag (bool): Cargar los arreglos guardados como memmap
+    - sector_flag (bool): Diagonalizar por bloques de magnetizacion total (construct_block_hamiltonian)
+output:
+    - Spectrum con el espectro del hamiltoniano
+"""
+def construct_spectrum(list_operators: list, spins: list, vectors_flag: bool = False, store_dir: str = None, mmap_flag: bool = False, sector_flag: bool = False) -> Spectrum:
+    path = None
+    if store_dir is not None:
+        path = os.path.join( store_dir, spectrum_key(list_operators, spins) )
+        if os.path.exists( path + "_values.npy" ):
+            spectrum = Spectrum.load(path, mmap_flag)
+            if spectrum.vectors is not None or not vectors_flag:
+                instrumentation.count("spectrum_cache_hit")
+                return spectrum
+
+    if sector_flag:
+        op = construct_block_hamiltonian(list_operators, spins)
+    else:
+        op = construct_hamiltonian(list_operators, spins)
+    spectrum = Spectrum(op)
+    if vectors_flag:
+        spectrum.eigh()
+    else:
+        spectrum.eigvalsh()
+
+    if path is not None:
+        os.makedirs( store_dir, exist_ok=True )
+        spectrum.save(path)
+    return spectrum
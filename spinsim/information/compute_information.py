@@ -1,7 +1,9 @@
 import numpy as np
-import mpmath as mp
-np.seterr(all='raise') 
-dtype = 'float64'
+import scipy as sc
+from scipy.sparse.linalg import eigsh
+from spinsim.hamiltonian.build_hamiltonian import diagonalize
+from spinsim.hamiltonian.build_spectrum import column_blocks
+from spinsim import instrumentation, precision
 boltz = 8.617333262e-5 #eV/K
 
 
@@ -14,6 +16,7 @@ output:
     - vn: entropia de von neumann
 """ 
 def von_neumann_entropy(ee: np.array) -> float:
+    dtype = precision.accumulate_dtype()
     ee = ee[ ee>0 ]
     if ee.shape[0] > 0:
         return np.sum( -ee*np.log(ee, dtype=dtype), dtype=dtype )
@@ -36,7 +39,8 @@ def concurrence(rho: np.array) -> float:
 
 
 """
-Funcion para calcular la traza parcial de una matriz cuadrada, de izquierda a derecha
+Funcion para calcular la traza parcial de una matriz cuadrada, de izquierda a derecha. Si la matriz es un
+memmap (ver construct_density_matrix) se suman los bloques diagonales leyendo uno a la vez desde disco
 input:
     - rho: Matriz densidad
     - spin_list: Lista con los valores del spin en cada sitio
@@ -45,10 +49,55 @@ output:
     - sub_system: matriz resultante de aplicar la traza parcial
 """ 
 def partial_trace_lr(rho: np.array, spin_list: list, number_spines: int) -> np.array:    
-    for i in range( number_spines ):
-        s = int( 2*spin_list[i] + 1 )
-        rho = np.sum( [rho[ s*j: s*(j+1), s*j:s*(j+1)] for j in range( int(rho.shape[0]/s) )], axis=0 )
-    return rho
+    left = int( np.prod( [ 2*s + 1 for s in spin_list[:number_spines] ] ) )
+    right = rho.shape[0]//left
+    if isinstance(rho, np.memmap):
+        sub_system = np.zeros( (right, right), dtype=np.result_type( rho.dtype, precision.accumulate_dtype() ) )
+        for i in range(left):
+            sub_system += rho[i*right:(i+1)*right, i*right:(i+1)*right]
+        return sub_system
+    # La matriz se ve como un tensor (izquierda, derecha, izquierda, derecha) y se traza la izquierda
+    return np.einsum( 'ijik->jk', rho.reshape(left, right, left, right) )
+
+
+"""
+Funcion para calcular la traza parcial de una matriz cuadrada sobre un conjunto arbitrario de sitios,
+la matriz se ve como un tensor con un indice por sitio y se usa einsum, por lo que no se copia la matriz
+input:
+    - rho: Matriz densidad
+    - spin_list: Lista con los valores del spin en cada sitio
+    - keep: Lista con los indices de los sitios que se mantienen
+output:
+    - sub_system: matriz reducida de los sitios de keep (en orden creciente)
+"""
+def partial_trace(rho: np.array, spin_list: list, keep: list) -> np.array:
+    dims = [ int(2*s + 1) for s in spin_list ]
+    size = len(dims)
+    keep = sorted(keep)
+
+    # Los sitios trazados comparten el indice de fila y columna
+    rows = list( range(size) )
+    cols = [ i if i not in keep else size + i for i in range(size) ]
+    out = keep + [ size + i for i in keep ]
+    reduced = np.einsum( rho.reshape(dims + dims), rows + cols, out )
+    dim_keep = int( np.prod( [ dims[i] for i in keep ] ) )
+    return reduced.reshape(dim_keep, dim_keep)
+
+
+"""
+Funcion para calcular todas las trazas parciales de izquierda a derecha, cada matriz reducida se obtiene
+trazando un sitio de la anterior, de forma que el costo total es similar al de una sola traza
+input:
+    - rho: Matriz densidad
+    - spin_list: Lista con los valores del spin en cada sitio
+output:
+    - Lista de matrices reducidas, el elemento i es el resultado de trazar los primeros i sitios
+"""
+def partial_trace_sweep(rho: np.array, spin_list: list) -> list:
+    reduced = [ rho ]
+    for i in range( len(spin_list) - 1 ):
+        reduced.append( partial_trace_lr( reduced[-1], spin_list[i:], 1 ) )
+    return reduced
 
 
 
@@ -75,33 +124,194 @@ input:
     - ee: Arreglo con las energias del sistema, ordenados de menor a mayor
     - tol: Tolerancia respecto a errores numericos de las energia
 output:
-    - Cantidad de estados a consirar, en caso de error se retorna -1
+    - Cantidad de estados a consirar, en caso de que todas las energias esten degeneradas se retorna -1
 """
 def count_rep_gs(ee: np.array, tol: float) -> int:
-    for i, ee in enumerate(ee):
-        if np.abs( ee - ee[0] )>tol:
-            return i+1
+    for i, e in enumerate(ee):
+        if np.abs( e - ee[0] )>tol:
+            return i
     return -1
 
 
 """
-Funcion para construir la matriz densidad de un conjunto de estados con cierta probabilidad
+Funcion para obtener el estado de minima energia y sus degenerados. Para matrices densas se usa eigh,
+para objetos con el metodo eigh (por ejemplo BlockHamiltonian o Spectrum) se usa este metodo,
+para matrices sparse o LinearOperator se usa Lanczos (eigsh) con los k estados de menor energia, en caso
+de que los k estados esten degenerados se duplica k hasta encontrar un estado no degenerado.
+input:
+    - op: Operador hermitiano (numpy array, matriz sparse, LinearOperator, BlockHamiltonian o Spectrum)
+    - k: Cantidad inicial de estados a calcular con Lanczos
+    - tol: Tolerancia respecto a errores numericos de las energia
+output:
+    - ee: Energias del estado base y sus degenerados
+    - vv: Vectores propios asociados en formato columna
+"""
+def ground_states(op, k: int = 6, tol: float = 1e-7) -> tuple:
+    size = op.shape[0]
+    while True:
+        with instrumentation.stage("ground_states", k=k) as record:
+            record.add_matrix("operator", op)
+            if hasattr(op, 'eigh'):
+                ee, vv = op.eigh()
+            elif isinstance(op, np.ndarray) or k >= size-1:
+                if not isinstance(op, np.ndarray):
+                    op = op.toarray() if sc.sparse.issparse(op) else op @ np.eye(size)
+                ee, vv = np.linalg.eigh(op)
+            else:
+                ee, vv = eigsh(op, k=k, which='SA')
+                order = np.argsort(ee)
+                ee, vv = ee[order], vv[:, order]
+
+        cant = count_rep_gs(ee, tol)
+        if cant != -1:
+            # Se copian los estados para liberar la matriz completa de vectores propios
+            return ee[:cant], vv[:, :cant].copy()
+        if ee.shape[0] == size:
+            return ee, vv
+        k = 2*k
+
+
+"""
+Funcion para construir la matriz densidad de un conjunto de estados con cierta probabilidad, la matriz se
+construye por bloques de filas, de forma que con store_path solo un bloque esta en memoria
 input:    
     - vv (list): Lista de estados equiprobables en formato columna
     - pp (list): Lista de las probabilidades de los estados (| amplitud_i |**2)
     - size (tuple): Tupla con el tamaño de la matriz densidad
+    - store_path (string): Archivo .npy donde se escribe la matriz, None para construirla en memoria
 output:
-    - Matriz densidad con valores reales
+    - Matriz densidad con valores reales con la precision de almacenamiento de spinsim.precision (memmap de
+    solo lectura si store_path no es None)
 """
-def construct_density_matrix(vv: list, pp: list, size: tuple) -> np.array:
-    density = np.zeros( size )
-    for st, prob in zip(vv, pp):
-        state = st
-        state_dag = state.T.conj()
-        density += prob*( state_dag.dot( state ) )
-    return np.real( density )
+def construct_density_matrix(vv: list, pp: list, size: tuple, store_path: str = None) -> np.array:
+    dtype = precision.storage_dtype()
+    states = np.column_stack( [ np.ravel(st) for st in vv ] )
+    weighted = states*np.asarray(pp)
+    if store_path is None:
+        density = np.zeros( size, dtype=dtype )
+    else:
+        density = np.lib.format.open_memmap( store_path, mode='w+', dtype=dtype, shape=size )
+
+    # La matriz es hermitiana, por lo que los bloques de filas usan los mismos limites que los de columnas
+    for rows in column_blocks( size[1], size[0], np.dtype(dtype).itemsize ):
+        density[rows] = np.real( weighted[rows] @ states.conj().T )
+    if store_path is None:
+        return density
+    density.flush()
+    del density
+    return np.load( store_path, mmap_mode='r' )
+
 
 
+"""
+Funcion para calcular los valores propios de la matriz reducida de un conjunto de estados puros con cierta
+probabilidad, sin construir la matriz densidad. Cada estado se ve como una matriz (izquierda, derecha) y se
+apilan multiplicados por la raiz de su probabilidad, los valores propios de la matriz reducida de la derecha
+son los valores singulares al cuadrado (descomposicion de Schmidt para un solo estado).
+input:
+    - vv: Estados en formato columna (D, K)
+    - pp: Lista de las probabilidades de los estados
+    - spin_list: Lista con los valores del spin en cada sitio
+    - number_spines: Numero de espines que se eliminan del sistema, de izquierda a derecha
+output:
+    - Valores propios de la matriz reducida
+"""
+def schmidt_values(vv: np.array, pp: list, spin_list: list, number_spines: int) -> np.array:
+    left = int( np.prod( [ 2*s + 1 for s in spin_list[:number_spines] ] ) )
+    right = vv.shape[0]//left
+    stacked = np.concatenate( [ np.sqrt(p)*vv[:, k].reshape(left, right) for k, p in enumerate(pp) ], axis=0 )
+    return np.linalg.svd( stacked, compute_uv=False )**2
+
+
+"""
+Funcion para ver cada vector propio como una matriz (sitios de keep, sitios trazados)
+input:
+    - vv: Vectores propios en formato columna (D, M)
+    - spin_list: Lista con los valores del spin en cada sitio
+    - keep: Lista con los indices de los sitios que se mantienen
+output:
+    - Arreglo (dA, dB, M), es una copia de vv (D*M elementos)
+"""
+def eigenvector_tensor(vv: np.array, spin_list: list, keep: list) -> np.array:
+    dims = [ int(2*s + 1) for s in spin_list ]
+    keep = sorted(keep)
+    trace = [ i for i in range(len(dims)) if i not in keep ]
+    dim_keep = int( np.prod( [ dims[i] for i in keep ] ) )
+    tensor = np.asarray(vv).reshape( dims + [vv.shape[1]] ).transpose( keep + trace + [len(dims)] )
+    return tensor.reshape( dim_keep, -1, vv.shape[1] )
+
+
+"""
+Funcion para calcular la matriz reducida de cada vector propio, Tr_B |n><n|, sobre los sitios de keep. El
+resultado tiene M*dA*dA elementos, por lo que solo conviene cuando dA*dA <= D (ver thermal_entanglement_workflow)
+input:
+    - vv: Vectores propios en formato columna (D, M)
+    - spin_list: Lista con los valores del spin en cada sitio
+    - keep: Lista con los indices de los sitios que se mantienen
+output:
+    - Arreglo (M, dA, dA) con la matriz reducida de cada vector propio
+"""
+def reduced_eigenvector_blocks(vv: np.array, spin_list: list, keep: list) -> np.array:
+    tensor = eigenvector_tensor(vv, spin_list, keep)
+    return np.einsum( 'abn,cbn->nac', tensor, tensor.conj() )
+
+
+"""
+Pesos de Boltzmann normalizados (T, M) de un arreglo de energias
+"""
+def boltzmann_weights(ee: np.array, temp: np.array) -> np.array:
+    beta = 1.0/(np.asarray(temp)*boltz)
+    with np.errstate(under='ignore'):
+        weights = np.exp( -np.outer( beta, ee - np.min(ee) ) )
+    return weights/np.sum( weights, axis=1 )[:, None]
+
+
+"""
+Funcion para calcular la entropia de von Neumann y la concurrencia de los estados de Gibbs reducidos en un
+bloque de temperaturas, rho_A(T) = sum_n p_n(T) Tr_B |n><n|
+input:
+    - ee: Arreglo con las energias del sistema
+    - reduced: Matrices reducidas de cada vector propio (ver reduced_eigenvector_blocks)
+    - temp: Arreglo de temperaturas
+output:
+    - Arreglo (2, T) con la entropia y la concurrencia en cada temperatura
+"""
+def thermal_entanglement_block(ee: np.array, reduced: np.array, temp: np.array) -> np.array:
+    weights = boltzmann_weights(ee, temp)
+    dim = reduced.shape[1]
+    rho = ( weights @ reduced.reshape(reduced.shape[0], -1) ).reshape(-1, dim, dim)
+    entropy = [ von_neumann_entropy( np.linalg.eigvalsh(r) ) for r in rho ]
+    purity = np.real( np.einsum('tab,tba->t', rho, rho) )
+    return np.array( [ entropy, np.sqrt( 2*np.clip(1 - purity, 0, None) ) ] )
+
+
+"""
+Igual que thermal_entanglement_block, pero sin matrices reducidas por vector propio. Para cada temperatura
+rho_A(T) = sum_n p_n M_n M_n^dagger, donde M_n (dA, dB) es el vector n visto como matriz, se acumula por bloques
+de vectores (ver column_blocks): cada bloque se multiplica por sqrt(p_n), se apila en el indice trazado y se
+suma X X^dagger. La memoria adicional es rho_A (dA*dA elementos) y un bloque de a lo mas block_bytes.
+input:
+    - ee: Arreglo con las energias del sistema
+    - tensor: Vectores propios como arreglo (dA, dB, M) (ver eigenvector_tensor)
+    - temp: Arreglo de temperaturas
+output:
+    - Arreglo (2, T) con la entropia y la concurrencia en cada temperatura
+"""
+def thermal_entanglement_states_block(ee: np.array, tensor: np.array, temp: np.array) -> np.array:
+    weights = boltzmann_weights(ee, temp)
+    dim_keep = tensor.shape[0]
+    blocks = column_blocks( dim_keep*tensor.shape[1], tensor.shape[2], tensor.dtype.itemsize )
+    values = np.zeros( (2, weights.shape[0]) )
+    for t, w in enumerate(weights):
+        rho = np.zeros( (dim_keep, dim_keep), dtype=tensor.dtype )
+        for cols in blocks:
+            stacked = ( tensor[:, :, cols]*np.sqrt(w[cols]) ).reshape( dim_keep, -1 )
+            rho += stacked @ stacked.conj().T
+        values[0, t] = von_neumann_entropy( np.linalg.eigvalsh(rho) )
+        purity = np.real( np.einsum('ab,ba->', rho, rho) )
+        values[1, t] = np.sqrt( 2*max(1 - purity, 0) )
+    return values
+
 
 """
 Workflows
@@ -111,19 +321,61 @@ Funcion que permite calcular la entropia de von Neumann de la matriz de densidad
 una topologia lineal. Para entender el proceso, considera que los espines son ordenados de forma lineal siguiendo la
 enumeracion ingresada y en base a ella se procede a aplicar una traza parcial hasta que no quede mas sistema.
 input:
-    - op: Operador al que se le va a calcular la entropia en cada traza parcial.
+    - op: Operador al que se le va a calcular la entropia en cada traza parcial (numpy array, matriz sparse
+    o LinearOperator, ver ground_states).
     - spin_list: Lista con el valor de los espines en cada sito
+    - k: Cantidad inicial de estados a calcular con Lanczos
 output:
     - Lista con los valores de la entropia en cada aplicacion de la traza que van desde no aplicarla hasta que no quede un espin.
 """
-def entanglement_entropy_per_site_gs(op: np.array, spin_list: list, parallel_flag: bool, parallel_vars: dict) -> list:
-    ee, vv = np.linalg.eigh(op)
-    cant = count_rep_gs(ee, 1e-7)
+def entanglement_entropy_per_site_gs(op: np.array, spin_list: list, parallel_flag: bool, parallel_vars: dict, k: int = 6) -> list:
+    ee, vv = ground_states(op, k, 1e-7)
+    cant = ee.shape[0]
     
-    #Lista de vectores propios transpuestos
-    vv = [ np.array( [vv[:,i]] ).T for i in range(cant) ]
+    # La entropia de cada corte se obtiene de la descomposicion de Schmidt de los estados, sin
+    # construir la matriz densidad
     pp = [ 1.0/cant for _ in range(cant) ]
-    density = construct_density_matrix( vv, pp, op.shape )
-    
-    return [ von_neumann_entropy( np.linalg.eigvalsh( partial_trace_lr( density, spin_list, i )  ) ) for i in range( len(spin_list) ) ]
+    with instrumentation.stage("schmidt_values", states=cant, cuts=len(spin_list)):
+        return [ von_neumann_entropy( schmidt_values( vv, pp, spin_list, i ) ) for i in range( len(spin_list) ) ]
+
+
+"""
+Funcion que calcula la entropia de von Neumann y la concurrencia del estado de Gibbs reducido a los sitios
+de keep para un conjunto de temperaturas. Se diagonaliza una sola vez y nunca se construye la matriz densidad
+completa. Si dA*dA <= D se construyen las matrices reducidas de cada vector propio (M*dA*dA elementos, ver
+reduced_eigenvector_blocks), en otro caso ese arreglo seria mayor que rho(T), por lo que rho_A(T) se calcula
+en cada temperatura acumulando bloques de vectores (una copia reordenada de los vectores, dA*dA elementos y un
+bloque de a lo mas block_bytes, ver thermal_entanglement_states_block). El calculo en paralelo separa las temperaturas en bloques (uno por worker
+o parallel_vars['chunks']).
+input:
+    - op: Hamiltoniano (numpy array, matriz sparse, BlockHamiltonian o Spectrum)
+    - spin_list: Lista con el valor de los espines en cada sito
+    - keep: Lista con los indices de los sitios del subsistema
+    - temp: Arreglo con las temperaturas
+output:
+    - Diccionario con los arreglos entropy y concurrence
+"""
+def thermal_entanglement_workflow(op: np.array, spin_list: list, keep: list, temp: np.array, parallel_flag: bool, parallel_vars: dict) -> dict:
+    ee, vv = diagonalize(op, True)
+    dim_keep = int( np.prod( [ 2*spin_list[i] + 1 for i in keep ] ) )
+    if dim_keep*dim_keep <= vv.shape[0]:
+        with instrumentation.stage("reduced_eigenvector_blocks", keep=len(keep)) as record:
+            states = reduced_eigenvector_blocks(vv, spin_list, keep)
+            record.add_matrix("reduced", states)
+        block_function = thermal_entanglement_block
+    else:
+        states = eigenvector_tensor(vv, spin_list, keep)
+        block_function = thermal_entanglement_states_block
+    del vv
 
+    if parallel_flag:
+        import dask as dk
+        chunks = parallel_vars.get( 'chunks', parallel_vars['num_workers'] )
+        blocks = [ b for b in np.array_split( np.asarray(temp), chunks ) if b.shape[0] > 0 ]
+        ee_d, states_d = dk.delayed(ee, pure=True), dk.delayed(states, pure=True)
+        pre_compute_values = [ dk.delayed(block_function)(ee_d, states_d, b) for b in blocks ]
+        valores = dk.compute( *pre_compute_values, scheduler=parallel_vars['scheduler'], num_workers=parallel_vars['num_workers'] )
+        valores = np.concatenate( valores, axis=1 )
+    else:
+        valores = block_function(ee, states, temp)
+    return { "entropy": valores[0], "concurrence": valores[1] }
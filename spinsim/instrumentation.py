@@ -0,0 +1,184 @@
+import time
+import tracemalloc
+import numpy as np
+import scipy as sc
+from contextlib import contextmanager
+
+# Reportes activos, las mediciones se guardan en el ultimo. Si la lista esta vacia la instrumentacion esta
+# desactivada y stage/count no hacen nada
+active_reports = []
+
+
+"""
+Reporte de una ejecucion instrumentada
+    - stages: Lista de diccionarios, uno por etapa en el orden en que terminan, con name, seconds, depth
+    y la informacion agregada por cada etapa (dimension, nnz, bytes, peak_bytes si se mide la memoria)
+    - counters: Diccionario con la cantidad de veces que ocurrio cada evento (por ejemplo mpmath_fallback)
+"""
+class Report:
+    def __init__(self, memory_flag: bool = False):
+        self.memory_flag = memory_flag
+        self.stages = []
+        self.counters = {}
+        self.stack = []
+
+    """
+    Resumen por nombre de etapa
+    output:
+        - Diccionario con calls, seconds (total) y peak_bytes (maximo, si se mide la memoria) de cada etapa
+    """
+    def summary(self) -> dict:
+        result = {}
+        for record in self.stages:
+            row = result.setdefault( record["name"], { "calls": 0, "seconds": 0.0 } )
+            row["calls"] += 1
+            row["seconds"] += record["seconds"]
+            if "peak_bytes" in record:
+                row["peak_bytes"] = max( row.get("peak_bytes", 0), record["peak_bytes"] )
+        return result
+
+    def as_dict(self) -> dict:
+        return { "stages": [ dict(record) for record in self.stages ], "counters": dict(self.counters) }
+
+
+"""
+Informacion de una matriz para el reporte
+input:
+    - matrix: Matriz densa, sparse o cualquier objeto con shape (LinearOperator, BlockHamiltonian)
+output:
+    - Diccionario con shape, dtype, nnz y bytes (los dos ultimos solo para matrices densas o sparse),
+    para un BlockHamiltonian se agrega la cantidad de bloques y los bytes de todos los bloques
+"""
+def matrix_info(matrix) -> dict:
+    info = { "shape": tuple( getattr(matrix, "shape", ()) ) }
+    if hasattr(matrix, "dtype"):
+        info["dtype"] = str(matrix.dtype)
+    if sc.sparse.issparse(matrix):
+        matrix = matrix.tocsr()
+        info["nnz"] = int(matrix.nnz)
+        info["bytes"] = int( matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes )
+    elif isinstance(matrix, np.ndarray):
+        info["nnz"] = int( np.count_nonzero(matrix) )
+        info["bytes"] = int(matrix.nbytes)
+    elif hasattr(matrix, "blocks"):
+        info["blocks"] = len(matrix.blocks)
+        info["bytes"] = int( sum( b.nbytes for b in matrix.blocks.values() ) )
+    return info
+
+
+"""
+Etapa medida de un reporte, se usa con stage
+"""
+class Stage:
+    def __init__(self, report: Report, name: str, info: dict):
+        self.report = report
+        self.record = dict(info, name=name)
+
+    def __enter__(self):
+        report = self.report
+        self.record["depth"] = len(report.stack)
+        if report.memory_flag:
+            current, peak = tracemalloc.get_traced_memory()
+            # El pico se reinicia en cada etapa, la etapa que la contiene guarda el pico anterior
+            if report.stack:
+                report.stack[-1].peak = max( report.stack[-1].peak, peak )
+            tracemalloc.reset_peak()
+            self.base, self.peak = current, current
+        report.stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.record["seconds"] = time.perf_counter() - self.start
+        report = self.report
+        report.stack.remove(self)
+        if report.memory_flag:
+            self.peak = max( self.peak, tracemalloc.get_traced_memory()[1] )
+            self.record["peak_bytes"] = self.peak - self.base
+            if report.stack:
+                report.stack[-1].peak = max( report.stack[-1].peak, self.peak )
+        report.stages.append(self.record)
+        return False
+
+    """
+    Agregar informacion a la etapa
+    """
+    def add(self, **info) -> None:
+        self.record.update(info)
+
+    """
+    Agregar la informacion de una matriz a la etapa (ver matrix_info)
+    """
+    def add_matrix(self, key: str, matrix) -> None:
+        self.record[key] = matrix_info(matrix)
+
+
+"""
+Etapa usada cuando la instrumentacion esta desactivada, no mide nada
+"""
+class DisabledStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def add(self, **info) -> None:
+        pass
+
+    def add_matrix(self, key: str, matrix) -> None:
+        pass
+
+
+disabled_stage = DisabledStage()
+
+
+"""
+Medir una etapa, se usa como contexto. Si no hay un reporte activo se retorna una etapa que no hace nada
+input:
+    - name (string): Nombre de la etapa
+    - info: Informacion de la etapa (por ejemplo dimension)
+output:
+    - Etapa con los metodos add y add_matrix
+"""
+def stage(name: str, **info):
+    if not active_reports:
+        return disabled_stage
+    return Stage(active_reports[-1], name, info)
+
+
+"""
+Contar un evento en el reporte activo, por ejemplo el uso de mpmath cuando la exponencial diverge
+input:
+    - name (string): Nombre del evento
+"""
+def count(name: str) -> None:
+    if active_reports:
+        counters = active_reports[-1].counters
+        counters[name] = counters.get(name, 0) + 1
+
+
+"""
+Activar la instrumentacion de hamiltonian, thermodynamic e information dentro del contexto. Las etapas se
+miden en el proceso actual, con el scheduler 'processes' de dask no se registran las tareas de los workers.
+input:
+    - memory_flag (bool): Si es verdadero se mide el pico de memoria de cada etapa con tracemalloc
+    - callback (callable): Funcion que recibe el reporte al salir del contexto, puede ser None
+output:
+    - Reporte que se completa durante el contexto
+"""
+@contextmanager
+def instrument(memory_flag: bool = False, callback = None):
+    report = Report(memory_flag)
+    started = memory_flag and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    active_reports.append(report)
+    try:
+        yield report
+    finally:
+        active_reports.remove(report)
+        if started:
+            tracemalloc.stop()
+        if callback is not None:
+            callback(report)
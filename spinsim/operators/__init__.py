@@ -1 +1,3 @@
-from .build_operators import *
\ No newline at end of file
+from .build_operators import *
+from .build_pauli_sum import *
+from .build_lattices import *
\ No newline at end of file
@@ -0,0 +1,116 @@
+import numpy as np
+
+
+"""
+Construir los enlaces de una red a partir de su celda unitaria. Los sitios se numeran como
+(y*lx + x)*cell_size + subred.
+input:
+    - lx (int): Numero de celdas en x
+    - ly (int): Numero de celdas en y
+    - cell_size (int): Numero de sitios por celda
+    - offsets (list): Lista de (subred_i, subred_j, dx, dy, tipo), cada uno une el sitio subred_i de la
+    celda (x, y) con el sitio subred_j de la celda (x+dx, y+dy)
+    - periodic (bool): Condiciones de borde periodicas
+output:
+    - bonds: Arreglo (B, 2) con los indices (i < j) de cada enlace
+    - kinds: Arreglo (B,) con el tipo de cada enlace
+"""
+def cell_bonds(lx: int, ly: int, cell_size: int, offsets: list, periodic: bool) -> tuple:
+    x, y = np.meshgrid( np.arange(lx), np.arange(ly), indexing='xy' )
+    x, y = x.ravel(), y.ravel()
+    bonds, kinds = [], []
+    for (a, b, dx, dy, kind) in offsets:
+        xj, yj = x + dx, y + dy
+        if periodic:
+            xj, yj = xj%lx, yj%ly
+            mask = np.ones( x.shape[0], dtype=bool )
+        else:
+            mask = (xj >= 0) & (xj < lx) & (yj >= 0) & (yj < ly)
+        i = (y*lx + x)[mask]*cell_size + a
+        j = (yj*lx + xj)[mask]*cell_size + b
+        bonds.append( np.stack( [np.minimum(i, j), np.maximum(i, j)], axis=1 ) )
+        kinds.append( np.full( i.shape[0], kind ) )
+    bonds, kinds = np.concatenate(bonds), np.concatenate(kinds)
+
+    # En redes pequeñas con bordes periodicos pueden aparecer enlaces repetidos o de un sitio consigo mismo
+    keep = bonds[:, 0] != bonds[:, 1]
+    bonds, kinds = bonds[keep], kinds[keep]
+    _, first = np.unique( bonds, axis=0, return_index=True )
+    first = np.sort(first)
+    return bonds[first], kinds[first]
+
+
+"""
+Redes para construir los indices de set_sij_vector, set_antisymmetric_exchange_vector o bond_terms
+input:
+    - length, lx, ly (int): Tamaño de la red en celdas
+    - periodic (bool): Condiciones de borde periodicas
+output:
+    - bonds: Arreglo (B, 2) con los indices (i < j) de cada enlace
+    - kinds: Arreglo (B,) con el tipo de cada enlace (ver cada red)
+"""
+# Cadena, un solo tipo de enlace
+def chain_lattice(length: int, periodic: bool) -> tuple:
+    return cell_bonds(length, 1, 1, [ (0, 0, 1, 0, 0) ], periodic)
+
+# Escalera de dos patas, sitio 2*x + pata, tipo 0 las patas y tipo 1 los peldaños
+def ladder_lattice(length: int, periodic: bool) -> tuple:
+    return cell_bonds(length, 1, 2, [ (0, 0, 1, 0, 0), (1, 1, 1, 0, 0), (0, 1, 0, 0, 1) ], periodic)
+
+# Red cuadrada, tipo 0 los enlaces en x y tipo 1 los enlaces en y
+def square_lattice(lx: int, ly: int, periodic: bool) -> tuple:
+    return cell_bonds(lx, ly, 1, [ (0, 0, 1, 0, 0), (0, 0, 0, 1, 1) ], periodic)
+
+# Red triangular, tipos 0, 1 y 2 para las direcciones a1, a2 y a2 - a1
+def triangular_lattice(lx: int, ly: int, periodic: bool) -> tuple:
+    return cell_bonds(lx, ly, 1, [ (0, 0, 1, 0, 0), (0, 0, 0, 1, 1), (0, 0, -1, 1, 2) ], periodic)
+
+# Red de panal de abeja, dos subredes (A=0, B=1), tipos 0, 1 y 2 para las tres direcciones de enlace
+def honeycomb_lattice(lx: int, ly: int, periodic: bool) -> tuple:
+    return cell_bonds(lx, ly, 2, [ (0, 1, 0, 0, 0), (0, 1, -1, 0, 1), (0, 1, 0, -1, 2) ], periodic)
+
+# Red kagome, tres subredes (A=0, B=1, C=2), tipo 0 los enlaces dentro de la celda y tipo 1 entre celdas
+def kagome_lattice(lx: int, ly: int, periodic: bool) -> tuple:
+    offsets = [ (0, 1, 0, 0, 0), (0, 2, 0, 0, 0), (1, 2, 0, 0, 0),
+        (1, 0, 1, 0, 1), (2, 0, 0, 1, 1), (2, 1, -1, 1, 1) ]
+    return cell_bonds(lx, ly, 3, offsets, periodic)
+
+
+"""
+Asignar el exchange de cada enlace segun su tipo
+input:
+    - kinds (numpy array): Tipo de cada enlace
+    - values (list): Exchange de cada tipo
+output:
+    - Arreglo con el exchange de cada enlace
+"""
+def bond_couplings(kinds: np.array, values: list) -> np.array:
+    return np.asarray(values)[kinds]
+
+
+"""
+Construir la lista de terminos J (a SxSx + b SySy + c SzSz) de cada enlace, los strings se construyen en
+bloque con arreglos de numpy
+input:
+    - bonds (numpy array): Arreglo (B, 2) con los indices de cada enlace
+    - couplings (numpy array): Exchange de cada enlace
+    - size (int): Numero de espines del sistema
+    - anisotropy (tuple): Factores (a, b, c) de cada eje
+output:
+    - Lista de [exchange, string], con los tres ejes de cada enlace seguidos
+"""
+def bond_terms(bonds: np.array, couplings: np.array, size: int, anisotropy: tuple = (1.0, 1.0, 1.0)) -> list:
+    bonds = np.asarray(bonds)
+    rows = np.arange( bonds.shape[0] )
+    strings = []
+    for op in "XYZ":
+        base = np.full( (bonds.shape[0], size), b"I", dtype="S1" )
+        base[rows, bonds[:, 0]] = op
+        base[rows, bonds[:, 1]] = op
+        strings.append( base.view( "S%d"%size ).ravel() )
+
+    terms = []
+    for k, J in enumerate( np.asarray(couplings).tolist() ):
+        for axis in range(3):
+            terms.append( [ J*anisotropy[axis], strings[axis][k].decode() ] )
+    return terms
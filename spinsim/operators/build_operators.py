@@ -26,7 +26,8 @@ def magnetic_vector(size: int) -> list:
 
 """
 Dzyaloshinskii–Moriya effect, no esta considerado el efecto del signo, es decir,
-hay que agregar que el segundo operador de cada lista tiene un signo negativos.
+hay que agregar que el segundo operador de cada lista tiene un signo negativos
+(antisymmetric_exchange_sum entrega los terminos con el signo incluido).
 input:
     - index (tuple): Indices de los espines considerados en la interaccion.
     - size (int): Numero de espines del sistema.
@@ -66,6 +67,7 @@ def antisymmetric_exchange_vector(index: tuple, size: int) -> list:
 """
 Dzyaloshinskii–Moriya effect, no esta considerado el efecto del signo, es decir,
 hay que agregar que el segundo operador de cada lista tiene un signo negativos
+(antisymmetric_exchange_sum entrega los terminos con el signo incluido).
 input:
     - indexes (list): Lista de tuplas con los indices de los pares de espines con la
     interaccion.
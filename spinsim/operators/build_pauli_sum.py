@@ -0,0 +1,142 @@
+import numpy as np
+
+
+"""
+Termino de un operador, guarda el coeficiente y solo los sitios distintos de la identidad
+"""
+class PauliTerm:
+    __slots__ = ("coefficient", "sites")
+
+    def __init__(self, coefficient: complex, sites: dict):
+        self.coefficient = coefficient
+        self.sites = { i: op for i, op in sites.items() if op != "I" }
+
+    """
+    Llave del termino, los sitios ordenados con su operador
+    """
+    def key(self) -> tuple:
+        return tuple( sorted( self.sites.items() ) )
+
+    """
+    String completo del termino para un sistema de size sitios
+    """
+    def to_string(self, size: int) -> str:
+        string = [ "I" ]*size
+        for i, op in self.sites.items():
+            string[i] = op
+        return "".join(string)
+
+
+"""
+Suma de terminos de operadores de espin, los terminos con el mismo operador se unen sumando sus coeficientes.
+Al iterar entrega pares [coeficiente, string], por lo que se puede usar directamente en construct_hamiltonian.
+"""
+class PauliSum:
+    __slots__ = ("size", "terms")
+
+    def __init__(self, size: int, terms: list = None):
+        self.size = size
+        self.terms = {}
+        for term in ( [] if terms is None else terms ):
+            self.add_term(term.coefficient, term.sites)
+
+    """
+    Agregar un termino, sites es un diccionario con el sitio y su operador
+    """
+    def add_term(self, coefficient: complex, sites: dict) -> None:
+        key = PauliTerm(coefficient, sites).key()
+        self.terms[key] = self.terms.get(key, 0) + coefficient
+
+    """
+    Construir la suma desde una lista de [exchange, string]
+    """
+    @staticmethod
+    def from_list(list_operators: list):
+        size = len( list_operators[0][1] )
+        result = PauliSum(size)
+        for (exchange, op) in list_operators:
+            result.add_term( exchange, dict( enumerate(op) ) )
+        return result
+
+    """
+    Eliminar los terminos con coeficiente menor o igual a tol y convertir a real los coeficientes
+    con parte imaginaria despreciable
+    """
+    def simplify(self, tol: float = 1e-12):
+        result = PauliSum(self.size)
+        for key, coefficient in self.terms.items():
+            if np.abs(coefficient) <= tol:
+                continue
+            if np.iscomplexobj(coefficient) and np.abs( np.imag(coefficient) ) <= tol:
+                coefficient = float( np.real(coefficient) )
+            result.terms[key] = coefficient
+        return result
+
+    """
+    Lista de [exchange, string] de los terminos
+    """
+    def to_list(self) -> list:
+        return [ [coefficient, PauliTerm(coefficient, dict(key)).to_string(self.size)] for key, coefficient in self.terms.items() ]
+
+    def __iter__(self):
+        return iter( self.to_list() )
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def __add__(self, other):
+        result = PauliSum(self.size)
+        for terms in (self.terms, other.terms):
+            for key, coefficient in terms.items():
+                result.terms[key] = result.terms.get(key, 0) + coefficient
+        return result
+
+    def __mul__(self, scalar: complex):
+        result = PauliSum(self.size)
+        result.terms = { key: scalar*coefficient for key, coefficient in self.terms.items() }
+        return result
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return -1*self
+
+    def __sub__(self, other):
+        return self + (-other)
+
+
+"""
+Producto punto Si*Sj de un conjunto de indices con su exchange
+input:
+    - indexes (list): Lista de tuplas con los indices de los pares de espines con la interaccion.
+    - exchanges (list): Exchange de cada par
+    - size (int): Numero de espines del sistema.
+output:
+    - PauliSum con los terminos J (SxSx + SySy + SzSz) de cada par
+"""
+def sij_sum(indexes: list, exchanges: list, size: int) -> PauliSum:
+    result = PauliSum(size)
+    for (i, j), exchange in zip(indexes, exchanges):
+        for op in "XYZ":
+            result.add_term( exchange, { i: op, j: op } )
+    return result
+
+
+"""
+Dzyaloshinskii–Moriya effect con el signo incluido, para cada eje se agrega el primer operador
+de antisymmetric_exchange_vector con signo positivo y el segundo con signo negativo.
+input:
+    - indexes (list): Lista de tuplas con los indices de los pares de espines con la interaccion.
+    - vectors (list): Vector (Di, Dj, Dk) de cada par
+    - size (int): Numero de espines del sistema.
+output:
+    - PauliSum con los terminos de Dzyaloshinskii–Moriya
+"""
+def antisymmetric_exchange_sum(indexes: list, vectors: list, size: int) -> PauliSum:
+    pairs = [ ("Y", "Z"), ("X", "Z"), ("X", "Y") ]
+    result = PauliSum(size)
+    for (i, j), vector in zip(indexes, vectors):
+        for (a, b), d in zip(pairs, vector):
+            result.add_term( d, { i: a, j: b } )
+            result.add_term( -d, { i: b, j: a } )
+    return result
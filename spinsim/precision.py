@@ -0,0 +1,85 @@
+import numpy as np
+from contextlib import contextmanager
+
+# Politica de precision, storage es el tipo real de las matrices, vectores y espectros que se guardan en
+# memoria y accumulate el tipo real de las sumas (construccion de terminos, pesos de Boltzmann, proyecciones).
+# Los tipos complejos se obtienen con la misma precision (float32 -> complex64, float64 -> complex128)
+policy = { "storage": np.dtype('float64'), "accumulate": np.dtype('float64') }
+
+
+"""
+Tipo real asociado a un dtype, por ejemplo complex64 -> float32
+"""
+def real_dtype(dtype) -> np.dtype:
+    return np.finfo( np.dtype(dtype) ).dtype
+
+
+"""
+Tipo de dato con la precision de precision_dtype, complejo si kind_dtype es complejo
+input:
+    - kind_dtype (dtype): Tipo que indica si el resultado es real o complejo
+    - precision_dtype (dtype): Tipo que indica la precision del resultado
+output:
+    - dtype de numpy
+"""
+def matching_dtype(kind_dtype, precision_dtype) -> np.dtype:
+    real = real_dtype(precision_dtype)
+    if np.issubdtype( np.dtype(kind_dtype), np.complexfloating ):
+        return np.result_type( real, np.complex64 )
+    return real
+
+
+"""
+Cambiar la politica de precision
+input:
+    - storage (dtype): float32 o float64 (tambien se aceptan complex64 o complex128)
+    - accumulate (dtype): Tipo de las sumas, por defecto el mismo de storage, no puede tener menos precision que storage
+"""
+def set_precision(storage = 'float64', accumulate = None) -> None:
+    storage = real_dtype(storage)
+    accumulate = storage if accumulate is None else real_dtype(accumulate)
+    for value in (storage, accumulate):
+        if value not in ( np.dtype('float32'), np.dtype('float64') ):
+            raise ValueError("Precision no soportada: %s"%value)
+    if accumulate.itemsize < storage.itemsize:
+        raise ValueError("La acumulacion no puede tener menos precision que el almacenamiento")
+    policy["storage"] = storage
+    policy["accumulate"] = accumulate
+
+
+"""
+Usar una politica de precision dentro de un contexto, al salir se recupera la anterior
+input:
+    - storage (dtype): float32 o float64
+    - accumulate (dtype): Tipo de las sumas, por defecto el mismo de storage
+"""
+@contextmanager
+def precision_policy(storage = 'float64', accumulate = None):
+    previous = dict(policy)
+    set_precision(storage, accumulate)
+    try:
+        yield policy
+    finally:
+        policy.update(previous)
+
+
+"""
+Tipo de dato de almacenamiento
+input:
+    - complex_flag (bool): Si es verdadero se retorna el tipo complejo
+output:
+    - dtype de numpy
+"""
+def storage_dtype(complex_flag: bool = False) -> np.dtype:
+    return matching_dtype( complex if complex_flag else float, policy["storage"] )
+
+
+"""
+Tipo de dato de acumulacion
+input:
+    - complex_flag (bool): Si es verdadero se retorna el tipo complejo
+output:
+    - dtype de numpy
+"""
+def accumulate_dtype(complex_flag: bool = False) -> np.dtype:
+    return matching_dtype( complex if complex_flag else float, policy["accumulate"] )
@@ -1 +1,4 @@
-from .compute_observables import *
\ No newline at end of file
+from .compute_observables import *
+from .compute_sweep import *
+from .compute_kpm import *
+from .compute_ftlm import *
\ No newline at end of file
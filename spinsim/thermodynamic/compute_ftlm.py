@@ -0,0 +1,114 @@
+import numpy as np
+from scipy.linalg import eigh_tridiagonal
+from .compute_observables import boltz
+from spinsim import instrumentation
+
+
+"""
+Base de Lanczos de un vector inicial con reortogonalizacion completa
+input:
+    - op: Operador hermitiano (numpy array, matriz sparse o LinearOperator)
+    - r (numpy array): Vector inicial normalizado
+    - n_steps (int): Numero maximo de pasos
+output:
+    - alpha: Diagonal de la matriz tridiagonal
+    - beta: Subdiagonal de la matriz tridiagonal
+    - basis: Vectores de Lanczos (pasos, D)
+"""
+def lanczos_basis(op, r: np.array, n_steps: int) -> tuple:
+    n_steps = min( n_steps, r.shape[0] )
+    basis = [ r ]
+    alpha, beta = [], []
+    for k in range(n_steps):
+        w = op @ basis[-1]
+        alpha.append( np.real( np.vdot(basis[-1], w) ) )
+        # Reortogonalizar contra toda la base para evitar estados fantasma
+        V = np.array(basis)
+        w = w - V.T @ ( V.conj() @ w )
+        w = w - V.T @ ( V.conj() @ w )
+        b = np.linalg.norm(w)
+        if k == n_steps-1 or b < 1e-12:
+            break
+        beta.append( b )
+        basis.append( w/b )
+    return np.array(alpha), np.array(beta), np.array(basis)
+
+
+"""
+Muestra del metodo de Lanczos a temperatura finita (FTLM) para un vector aleatorio
+input:
+    - op: Hamiltoniano (numpy array, matriz sparse o LinearOperator)
+    - operator: Operador al que se le calcula el valor esperado (numpy array o matriz sparse)
+    - n_steps (int): Numero de pasos de Lanczos
+    - seed: Semilla del vector aleatorio
+output:
+    - Arreglo (3, pasos) con las energias de Ritz, |<r|psi_j>|**2 y <r|psi_j><psi_j|O|r>
+"""
+def ftlm_sample(op, operator, n_steps: int, seed) -> np.array:
+    rng = np.random.default_rng(seed)
+    size = op.shape[0]
+    if np.issubdtype( np.dtype(op.dtype), np.complexfloating ):
+        r = np.exp( 2j*np.pi*rng.random(size) )
+    else:
+        r = rng.choice( [-1.0, 1.0], size=size )
+    r = r/np.linalg.norm(r)
+
+    alpha, beta, basis = lanczos_basis(op, r, n_steps)
+    if alpha.shape[0] == 1:
+        energies, phi = alpha, np.ones( (1, 1) )
+    else:
+        energies, phi = eigh_tridiagonal(alpha, beta)
+
+    # <r|psi_j> = phi[0, j] porque el primer vector de Lanczos es r
+    projection = basis.conj() @ (operator @ r)
+    overlap = phi[0, :]
+    return np.array( [ energies, overlap**2, np.real( overlap*(phi.T @ projection) ) ] )
+
+
+"""
+Funcion que calcula el valor esperado termico de un operador con el metodo de Lanczos a temperatura finita (FTLM),
+promediando sobre vectores aleatorios, cada uno con una corrida corta de Lanczos. El error se estima con jackknife
+sobre los vectores aleatorios. Los vectores se pueden calcular en paralelo con dask (por ejemplo con
+scheduler 'processes').
+input:
+    - op_base: Hamiltoniano (numpy array, matriz sparse o LinearOperator)
+    - operator: Operador al que se le calcula el valor esperado (numpy array o matriz sparse, ver construct_term)
+    - temp (numpy array): Arreglo con las temperaturas
+    - n_vectors (int): Numero de vectores aleatorios, al menos 2 para estimar el error
+    - n_steps (int): Numero de pasos de Lanczos por vector
+    - seed (int): Semilla de los vectores aleatorios
+    - parallel_flag (bool): Calcular los vectores en paralelo
+    - parallel_vars (dict): scheduler y num_workers de dask
+output:
+    - Arreglo de los valores esperados a diferentes temperaturas
+    - Arreglo con el error de cada valor
+"""
+def ftlm_expected_value_workflow(op_base, operator, temp: np.array, n_vectors: int = 32, n_steps: int = 60, seed: int = None, parallel_flag: bool = False, parallel_vars: dict = None) -> tuple:
+    if n_vectors < 2:
+        raise ValueError("Se necesitan al menos 2 vectores aleatorios para estimar el error con jackknife")
+    seeds = np.random.SeedSequence(seed).spawn(n_vectors)
+    with instrumentation.stage("ftlm_samples", vectors=n_vectors, steps=n_steps) as record:
+        record.add_matrix("operator", op_base)
+        if parallel_flag:
+            import dask as dk
+            op_d, operator_d = dk.delayed(op_base, pure=True), dk.delayed(operator, pure=True)
+            pre_compute_values = [ dk.delayed(ftlm_sample)(op_d, operator_d, n_steps, s) for s in seeds ]
+            samples = dk.compute( *pre_compute_values, scheduler=parallel_vars['scheduler'], num_workers=parallel_vars['num_workers'] )
+        else:
+            samples = [ ftlm_sample(op_base, operator, n_steps, s) for s in seeds ]
+
+    e0 = min( np.min(s[0]) for s in samples )
+    beta = 1.0/(np.asarray(temp)*boltz)
+    z, num = [], []
+    with np.errstate(under='ignore'):
+        for energies, z_weights, o_weights in samples:
+            boltzmann = np.exp( -np.outer( beta, energies - e0 ) )
+            z.append( boltzmann @ z_weights )
+            num.append( boltzmann @ o_weights )
+    z, num = np.array(z), np.array(num)
+
+    values = np.sum(num, axis=0)/np.sum(z, axis=0)
+    # Jackknife, se quita un vector aleatorio a la vez
+    partial = ( np.sum(num, axis=0) - num )/( np.sum(z, axis=0) - z )
+    errors = np.sqrt( (n_vectors - 1)/n_vectors*np.sum( (partial - np.mean(partial, axis=0))**2, axis=0 ) )
+    return values, errors
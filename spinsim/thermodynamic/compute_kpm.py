@@ -0,0 +1,128 @@
+import numpy as np
+from scipy.sparse.linalg import eigsh
+from .compute_observables import thermal_quantities
+from spinsim import instrumentation
+
+
+"""
+Estimar los limites del espectro con Lanczos, se agrega un margen de eps veces el ancho
+input:
+    - op: Operador hermitiano (numpy array, matriz sparse o LinearOperator)
+    - eps (float): Margen relativo
+output:
+    - Energia minima y maxima
+"""
+def spectral_bounds(op, eps: float = 0.01) -> tuple:
+    emin = eigsh(op, k=1, which='SA', tol=1e-6, return_eigenvectors=False)[0]
+    emax = eigsh(op, k=1, which='LA', tol=1e-6, return_eigenvectors=False)[0]
+    margin = eps*(emax - emin) + 1e-12
+    return emin - margin, emax + margin
+
+
+"""
+Kernel de Jackson para amortiguar las oscilaciones de Gibbs de la expansion de Chebyshev
+"""
+def jackson_kernel(n_moments: int) -> np.array:
+    n = np.arange(n_moments)
+    q = np.pi/(n_moments + 1)
+    return ( (n_moments - n + 1)*np.cos(q*n) + np.sin(q*n)/np.tan(q) )/(n_moments + 1)
+
+
+"""
+Calcular los momentos de Chebyshev mu_n = Tr[ T_n(H') ]/D con estimacion estocastica de la traza, H' es el
+hamiltoniano escalado al intervalo (-1, 1). Todos los vectores aleatorios se propagan juntos como un bloque.
+input:
+    - op: Operador hermitiano (numpy array, matriz sparse o LinearOperator)
+    - n_moments (int): Numero de momentos
+    - n_vectors (int): Numero de vectores aleatorios
+    - bounds (tuple): Limites del espectro (ver spectral_bounds)
+    - seed (int): Semilla de los vectores aleatorios
+output:
+    - Arreglo con los momentos
+"""
+def kpm_moments(op, n_moments: int, n_vectors: int, bounds: tuple, seed: int = None) -> np.array:
+    size = op.shape[0]
+    scale = (bounds[1] - bounds[0])/2.0
+    center = (bounds[1] + bounds[0])/2.0
+    rng = np.random.default_rng(seed)
+
+    # Vectores aleatorios con fase aleatoria, reales si el operador es real
+    if np.issubdtype( np.dtype(op.dtype), np.complexfloating ):
+        r = np.exp( 2j*np.pi*rng.random( (size, n_vectors) ) )
+    else:
+        r = rng.choice( [-1.0, 1.0], size=(size, n_vectors) )
+
+    mu = np.zeros(n_moments)
+    v_prev = r
+    v_curr = (op @ r - center*r)/scale
+    mu[0] = np.real( np.sum( r.conj()*v_prev ) )
+    if n_moments > 1:
+        mu[1] = np.real( np.sum( r.conj()*v_curr ) )
+    for n in range(2, n_moments):
+        v_next = 2*(op @ v_curr - center*v_curr)/scale - v_prev
+        mu[n] = np.real( np.sum( r.conj()*v_next ) )
+        v_prev, v_curr = v_curr, v_next
+    return mu/(size*n_vectors)
+
+
+"""
+Densidad de estados por el metodo del kernel polinomial (KPM), evaluada en los nodos de Chebyshev
+input:
+    - op: Operador hermitiano (numpy array, matriz sparse o LinearOperator)
+    - n_moments (int): Numero de momentos
+    - n_vectors (int): Numero de vectores aleatorios
+    - seed (int): Semilla de los vectores aleatorios
+    - bounds (tuple): Limites del espectro, por defecto se usa spectral_bounds
+output:
+    - energies: Energias de los nodos (2*n_moments nodos)
+    - weights: Numero de estados asociado a cada nodo, suma D
+    - dos: Densidad de estados en cada energia (estados por unidad de energia)
+"""
+def kpm_density_of_states(op, n_moments: int = 256, n_vectors: int = 16, seed: int = None, bounds: tuple = None) -> tuple:
+    if bounds is None:
+        bounds = spectral_bounds(op)
+    with instrumentation.stage("kpm_moments", moments=n_moments, vectors=n_vectors) as record:
+        record.add_matrix("operator", op)
+        mu = kpm_moments(op, n_moments, n_vectors, bounds, seed)*jackson_kernel(n_moments)
+
+    nodes = 2*n_moments
+    theta = np.pi*( np.arange(nodes) + 0.5 )/nodes
+    series = mu[0] + 2*np.cos( np.outer( theta, np.arange(1, n_moments) ) ) @ mu[1:]
+    scale = (bounds[1] - bounds[0])/2.0
+    energies = scale*np.cos(theta) + (bounds[1] + bounds[0])/2.0
+
+    size = op.shape[0]
+    weights = size*series/nodes
+    dos = size*series/( np.pi*np.sin(theta)*scale )
+    return energies, weights, dos
+
+
+"""
+Funcion que calcula las cantidades termodinamicas con KPM, la funcion de particion se integra sobre la densidad
+de estados con cuadratura de Chebyshev, los nodos con peso negativo (errores estocasticos) se descartan. La
+resolucion en energia es del orden de (Emax - Emin)/n_moments, por lo que a temperaturas menores se necesitan
+mas momentos.
+input:
+    - op: Operador hermitiano (numpy array, matriz sparse o LinearOperator)
+    - temp (numpy array): Arreglo con las temperaturas
+    - n_moments (int): Numero de momentos
+    - n_vectors (int): Numero de vectores aleatorios
+    - seed (int): Semilla de los vectores aleatorios
+output:
+    - Diccionario de thermal_quantities (log_z, energy, energy2, specific_heat, entropy)
+"""
+def kpm_thermal_workflow(op, temp: np.array, n_moments: int = 256, n_vectors: int = 16, seed: int = None) -> dict:
+    energies, weights, _ = kpm_density_of_states(op, n_moments, n_vectors, seed)
+    positive = weights > 0
+    return thermal_quantities( energies[positive], temp, degeneracy=weights[positive] )
+
+
+""" 
+Funciones que calculan el calor especifico y la entropia con KPM, mismo formato de specific_heat_workflow
+y entropy_workflow (ver kpm_thermal_workflow)
+"""
+def kpm_specific_heat_workflow(op, temp: np.array, n_moments: int = 256, n_vectors: int = 16, seed: int = None) -> np.array:
+    return kpm_thermal_workflow(op, temp, n_moments, n_vectors, seed)["specific_heat"]
+
+def kpm_entropy_workflow(op, temp: np.array, n_moments: int = 256, n_vectors: int = 16, seed: int = None) -> np.array:
+    return kpm_thermal_workflow(op, temp, n_moments, n_vectors, seed)["entropy"]
@@ -1,11 +1,15 @@
 import numpy as np
-import mpmath as mp
-import dask as dk
 from typing import Callable
-dtype = 'float64'
+from spinsim.hamiltonian.build_hamiltonian import diagonalize, construct_sparse_term
+from spinsim.hamiltonian.build_spectrum import column_blocks
+from spinsim import instrumentation, precision
 boltz = 8.617333262e-5 #eV/K
 
 
+# Nombre en thermal_quantities de cada funcion de observables, usado en el modo por bloques
+chunked_quantity = { "specific_heat": "specific_heat", "entropy": "entropy", "valor_esperado": "expected" }
+
+
 """
 Wrapper para paralelizar el calculo de funciones de observables
 input:
@@ -14,17 +18,56 @@ input:
     - ee (numpy array): Arreglo con los valores de energia ordenados de menor a mayor
     - proy (numpy array): Arreglo con las proyecciones de los estados sobre el operador
     - pre (int): Entero positivo que indica la precision para calculos grandes
-    - parallel_params (dict):
+    - parallel_params (dict): scheduler y num_workers de dask, opcionalmente mode con 'point' (una tarea
+    por temperatura, por defecto) o 'chunked' (ver chunked_wrapper)
+    - degeneracy (numpy array): Multiplicidad de cada energia (ver compress_spectrum), puede ser None
 output:
     - Lista con los valores del observable
 """
-def parallel_wrapper(func: Callable, temp: np.array, ee: np.array, proy: np.array, pre:int ,parallel_params: dict) -> list:
-    pre_compute_values = [ dk.delayed(func)
-        (ee, proy, t, pre) for t in temp]
-    valores_finales = dk.compute( *pre_compute_values, scheduler=parallel_params['scheduler'], num_workers=parallel_params['num_workers'] )
+def parallel_wrapper(func: Callable, temp: np.array, ee: np.array, proy: np.array, pre:int ,parallel_params: dict, degeneracy: np.array = None) -> list:
+    if parallel_params.get('mode', 'point') == 'chunked':
+        return list( chunked_wrapper( chunked_quantity[func.__name__], temp, ee, proy, parallel_params, degeneracy ) )
+    import dask as dk
+    with instrumentation.stage("parallel_wrapper", function=func.__name__, temperatures=len(temp), dimension=ee.shape[0]):
+        pre_compute_values = [ dk.delayed(func)
+            (ee, proy, t, pre, degeneracy) for t in temp]
+        valores_finales = dk.compute( *pre_compute_values, scheduler=parallel_params['scheduler'], num_workers=parallel_params['num_workers'] )
     return list(valores_finales)
 
 
+"""
+Tarea de chunked_wrapper, calcula una cantidad de thermal_quantities en un bloque de temperaturas
+"""
+def thermal_block(name: str, ee: np.array, temp: np.array, proy: np.array, degeneracy: np.array) -> np.array:
+    return thermal_quantities(ee, temp, proy, degeneracy=degeneracy)[name]
+
+
+"""
+Paralelizar thermal_quantities separando las temperaturas en bloques, por defecto uno por worker. El
+espectro se agrega una sola vez al grafo de dask y todos los bloques lo comparten.
+input:
+    - name (string): Cantidad de thermal_quantities a calcular
+    - temp (numpy array): Arreglo de temperaturas
+    - ee (numpy array): Arreglo con los valores de energia ordenados de menor a mayor
+    - proy (numpy array): Arreglo con las proyecciones de los estados sobre el operador, puede ser None
+    - parallel_params (dict): scheduler y num_workers de dask, opcionalmente chunks con la cantidad de bloques
+    - degeneracy (numpy array): Multiplicidad de cada energia (ver compress_spectrum), puede ser None
+output:
+    - Arreglo con los valores del observable
+"""
+def chunked_wrapper(name: str, temp: np.array, ee: np.array, proy: np.array, parallel_params: dict, degeneracy: np.array = None) -> np.array:
+    chunks = parallel_params.get( 'chunks', parallel_params['num_workers'] )
+    blocks = [ b for b in np.array_split( np.asarray(temp), chunks ) if b.shape[0] > 0 ]
+
+    import dask as dk
+    with instrumentation.stage("chunked_wrapper", quantity=name, temperatures=len(temp), dimension=ee.shape[0], chunks=len(blocks)):
+        # Un solo nodo por arreglo, de forma que no se copian en cada tarea del grafo
+        ee_d, proy_d, degeneracy_d = [ dk.delayed(x, pure=True) for x in (ee, proy, degeneracy) ]
+        pre_compute_values = [ dk.delayed(thermal_block, pure=True)(name, ee_d, b, proy_d, degeneracy_d) for b in blocks ]
+        valores_finales = dk.compute( *pre_compute_values, scheduler=parallel_params['scheduler'], num_workers=parallel_params['num_workers'] )
+    return np.concatenate(valores_finales, axis=-1)
+
+
 """
 Physical Quantities
 """
@@ -34,21 +77,29 @@ input:
     - ee (numpy array): Arreglo con los valores de energia ordenados de menor a mayor
     - t (float): Valor de temperatura
     - pre (int): Entero positivo que indica la precision para calculos grandes
+    - degeneracy (numpy array): Multiplicidad de cada energia (ver compress_spectrum), puede ser None
 output:
-    - Arreglo con las probabilidades asociadas a cada valor de energia
+    - Arreglo con las probabilidades asociadas a cada valor de energia (de un solo estado en caso de
+    ingresar la multiplicidad)
 """
-def prob_states(ee: np.array, t: float, pre: int) -> np.array:
-    np.seterr(all='raise')
+def prob_states(ee: np.array, t: float, pre: int, degeneracy: np.array = None) -> np.array:
+    dtype = precision.accumulate_dtype()
+    if degeneracy is None:
+        degeneracy = np.ones( ee.shape[0] )
     beta = 1.0/(t*boltz)
-    ee_var = -ee*beta
+    # Se resta la energia minima para que la exponencial no diverja
+    ee_var = -(ee - np.min(ee))*beta
     try:
-        partition = np.exp( ee_var, dtype=dtype )
-        Z = np.sum(partition, dtype=dtype)
-        partition = np.divide( partition, Z, dtype=dtype )
+        with np.errstate(all='raise', under='ignore'):
+            partition = np.exp( ee_var, dtype=dtype )
+            Z = np.sum(degeneracy*partition, dtype=dtype)
+            partition = np.divide( partition, Z, dtype=dtype )
     except FloatingPointError:
+        instrumentation.count("mpmath_fallback")
+        import mpmath as mp
         with mp.workdps(pre):
             partition = [ mp.exp( e ) for e in ee_var ]
-            Z = mp.fdiv( 1.0, mp.fsum(partition) )
+            Z = mp.fdiv( 1.0, mp.fsum( [ mp.fmul(g, p) for g, p in zip(degeneracy, partition) ] ) )
             partition = [ float( mp.fmul(p, Z) ) for p in partition ]
     return np.round(np.array(partition),10)
 
@@ -59,22 +110,30 @@ input:
     - ee (numpy array): Arreglo con los valores de energia ordenados de menor a mayor
     - t (float): Valor de temperatura
     - pre (int): Entero positivo que indica la precision para calculos grandes
+    - degeneracy (numpy array): Multiplicidad de cada energia (ver compress_spectrum), puede ser None
 output:
     - Logaritmo natural de Z
 """
-def log_z_function(ee: np.array, t: float, pre: int) -> np.array:
-    np.seterr(all='raise')
+def log_z_function(ee: np.array, t: float, pre: int, degeneracy: np.array = None) -> np.array:
+    dtype = precision.accumulate_dtype()
+    if degeneracy is None:
+        degeneracy = np.ones( ee.shape[0] )
     beta = 1.0/(t*boltz)
-    ee_var = -ee*beta
+    # Se resta la energia minima para que la exponencial no diverja, log Z = log Z' - beta*E0
+    e0 = np.min(ee)
+    ee_var = -(ee - e0)*beta
     try:
-        partition = np.exp( ee_var, dtype=dtype )
-        Z = np.sum(partition, dtype=dtype)
-        Z = np.log(Z)
+        with np.errstate(all='raise', under='ignore'):
+            partition = np.exp( ee_var, dtype=dtype )
+            Z = np.sum(degeneracy*partition, dtype=dtype)
+            Z = np.log(Z) - e0*beta
     except FloatingPointError:
+        instrumentation.count("mpmath_fallback")
+        import mpmath as mp
         with mp.workdps(pre):
             partition = [ mp.exp( e ) for e in ee_var ]
-            Z = mp.fsum(partition)
-            Z = mp.log(Z)
+            Z = mp.fsum( [ mp.fmul(g, p) for g, p in zip(degeneracy, partition) ] )
+            Z = mp.log(Z) - e0*beta
     return float(Z)
 
 """
@@ -84,11 +143,15 @@ input:
     - proy (numpy array): Arreglo con las proyecciones de los estados sobre el operador (producto braket)
     - t (float): Valor de temperatura
     - pre (int): Entero positivo que indica la precision para calculos grandes
+    - degeneracy (numpy array): Multiplicidad de cada energia (ver compress_spectrum), puede ser None
 output:
     - Valor del calor especifico en una temperatura especifica
 """
-def specific_heat(ee: np.array, proy: np.array, t: float, pre: int) -> float:
-    partition = prob_states(ee, t, pre)
+def specific_heat(ee: np.array, proy: np.array, t: float, pre: int, degeneracy: np.array = None) -> float:
+    dtype = precision.accumulate_dtype()
+    partition = prob_states(ee, t, pre, degeneracy)
+    if degeneracy is not None:
+        partition = degeneracy*partition
     entalpia = np.sum( partition*ee, dtype=dtype )
     entalpia_2 = np.sum( partition*(ee**2), dtype=dtype )
     tmp_var = entalpia_2 - (entalpia**2)
@@ -102,13 +165,17 @@ input:
     - proy (numpy array): Arreglo con las proyecciones de los estados sobre el operador (producto braket) 
     - t (float): Valor de temperatura
     - pre (int): Entero positivo que indica la precision para los calculos
+    - degeneracy (numpy array): Multiplicidad de cada energia (ver compress_spectrum), puede ser None
 output:
    - Valor de la entropia en una temperatura especifica 
 """
-def entropy(ee: np.array, proy: np.array, t: float, pre: int) -> float:
-    partition = prob_states(ee, t, pre)
+def entropy(ee: np.array, proy: np.array, t: float, pre: int, degeneracy: np.array = None) -> float:
+    dtype = precision.accumulate_dtype()
+    partition = prob_states(ee, t, pre, degeneracy)
+    if degeneracy is not None:
+        partition = degeneracy*partition
     thermal = np.sum( partition*ee, dtype=dtype )
-    free_energy = -boltz*log_z_function(ee, t, pre)
+    free_energy = -boltz*log_z_function(ee, t, pre, degeneracy)
     return np.divide(thermal, t, dtype=dtype) - free_energy
 
 
@@ -119,17 +186,135 @@ input:
     - proy (numpy array): Arreglo con las proyecciones de los estados sobre el operador (producto braket)
     - t (float): Valor de temperatura
     - pre (int): Entero positivo que indica la precision para los calculos
+    - degeneracy (numpy array): Multiplicidad de cada energia (ver compress_spectrum), en ese caso proy
+    es la suma de las proyecciones de cada nivel
 output:
     - Valor del valor esperado de un operador a una temperatura dada
 """
-def valor_esperado(ee: np.array, proy: np.array, t: float, pre: int) -> float:
-    partition = prob_states(ee, t, pre)
+def valor_esperado(ee: np.array, proy: np.array, t: float, pre: int, degeneracy: np.array = None) -> float:
+    dtype = precision.accumulate_dtype()
+    partition = prob_states(ee, t, pre, degeneracy)
     return np.sum( partition*proy, dtype=dtype )
 
 
 
 
 
+"""
+Comprimir un espectro degenerado en niveles (energia, multiplicidad, suma de proyecciones). Un nivel agrupa
+las energias que estan a una distancia menor o igual a tol de la primera energia del nivel, igual que
+en count_rep_gs.
+input:
+    - ee (numpy array): Arreglo con los valores de energia ordenados de menor a mayor
+    - proy (numpy array): Arreglo con las proyecciones de los estados sobre el operador (o arreglo
+    (operadores, D) de projections), puede ser None
+    - tol (float): Tolerancia respecto a errores numericos de las energia
+output:
+    - Energia promedio de cada nivel
+    - Multiplicidad de cada nivel
+    - Suma de las proyecciones de cada nivel (None si proy es None)
+"""
+def compress_spectrum(ee: np.array, proy: np.array = None, tol: float = 1e-7) -> tuple:
+    ee = np.asarray(ee)
+    starts = []
+    start = 0
+    while start < ee.shape[0]:
+        starts.append(start)
+        start = int( np.searchsorted(ee, ee[start] + tol, side='right') )
+    starts = np.array(starts)
+
+    degeneracy = np.diff( np.append(starts, ee.shape[0]) )
+    energies = np.add.reduceat(ee, starts)/degeneracy
+    if proy is not None:
+        proy = np.add.reduceat(proy, starts, axis=-1)
+    return energies, degeneracy, proy
+
+
+"""
+Calculo vectorizado de las cantidades termodinamicas para un arreglo de temperaturas, se construye la
+matriz de pesos de Boltzmann (T x D) restando la energia minima, de forma que no hay overflow y no se
+necesita mpmath. Las temperaturas se procesan por bloques para acotar la memoria.
+input:
+    - ee (numpy array): Arreglo con los valores de energia ordenados de menor a mayor
+    - temp (numpy array): Arreglo de temperaturas
+    - proy (numpy array): Arreglo con las proyecciones de los estados sobre el operador (o arreglo
+    (operadores, D) de projections, los pesos de Boltzmann se comparten entre todos los operadores), puede ser None
+    - chunk_size (int): Cantidad de temperaturas por bloque, por defecto se acota la matriz de pesos a 2**22 elementos
+    - degeneracy (numpy array): Multiplicidad de cada energia (ver compress_spectrum), en ese caso proy
+    es la suma de las proyecciones de cada nivel
+output:
+    - Diccionario con los arreglos log_z (logaritmo de Z), energy (<E>), energy2 (<E**2>), specific_heat,
+    entropy y expected (<O>, solo si proy no es None, de tamaño (operadores, T) si proy es de dos dimensiones)
+"""
+def thermal_quantities(ee: np.array, temp: np.array, proy: np.array = None, chunk_size: int = None, degeneracy: np.array = None) -> dict:
+    dtype = precision.accumulate_dtype()
+    ee = np.asarray(ee, dtype=dtype)
+    temp = np.atleast_1d( np.asarray(temp, dtype=dtype) )
+    if chunk_size is None:
+        chunk_size = max( 1, 2**22//ee.shape[0] )
+
+    if degeneracy is None:
+        degeneracy = np.ones( ee.shape[0], dtype=dtype )
+
+    e0 = np.min(ee)
+    shifted = ee - e0
+    # Energias multiplicadas por la multiplicidad de cada nivel
+    shifted_g = degeneracy*shifted
+    shifted_2 = degeneracy*shifted**2
+    names = [ "log_z", "energy", "energy2", "specific_heat", "entropy" ]
+    results = { name: np.zeros(temp.shape[0], dtype=dtype) for name in names }
+    if proy is not None:
+        results["expected"] = np.zeros( proy.shape[:-1] + temp.shape, dtype=np.result_type(proy, dtype) )
+
+    with np.errstate(under='ignore'), instrumentation.stage("thermal_quantities", temperatures=temp.shape[0], dimension=ee.shape[0]):
+        for start in range(0, temp.shape[0], chunk_size):
+            t = temp[start:start+chunk_size]
+            beta = 1.0/(t*boltz)
+            weights = np.exp( -np.outer(beta, shifted) )
+            # El estado de menor energia tiene peso 1, por lo que Z' >= 1
+            z = weights @ degeneracy
+            weights /= z[:, None]
+            energy = weights @ shifted_g
+            energy_2 = weights @ shifted_2
+
+            chunk = slice(start, start+t.shape[0])
+            results["log_z"][chunk] = np.log(z) - beta*e0
+            results["energy"][chunk] = e0 + energy
+            results["energy2"][chunk] = energy_2 + 2*e0*energy + e0**2
+            results["specific_heat"][chunk] = (energy_2 - energy**2)/(t*t*boltz)
+            results["entropy"][chunk] = energy/t + boltz*np.log(z)
+            if proy is not None:
+                results["expected"][..., chunk] = np.tensordot( proy, weights, axes=([-1], [1]) )
+    return results
+
+
+
+
+
+"""
+Calcular las proyecciones <n|O|n> de todos los vectores propios sobre un conjunto de operadores, los vectores
+se recorren por bloques de columnas (ver column_blocks), de forma que la memoria adicional esta acotada y los
+vectores pueden estar en disco (memmap)
+input:
+    - vv (numpy array): Vectores propios en formato columna, puede ser un memmap
+    - operators (list): Lista de operadores, cada uno puede ser una matriz densa, sparse o un string
+    (en ese caso se construye con construct_sparse_term)
+    - spins ([float]): Lista del valor del spin en cada uno de los sitios, solo necesaria para strings
+output:
+    - Arreglo real (operadores, D) con las proyecciones, los operadores son hermitianos por lo que se descarta
+    la parte imaginaria (que aparece con vectores propios complejos, por ejemplo en sectores de momento)
+"""
+def projections(vv: np.array, operators: list, spins: list = None) -> np.array:
+    operators = [ construct_sparse_term(op, spins) if isinstance(op, str) else op for op in operators ]
+    proy = []
+    with instrumentation.stage("projections", operators=len(operators), dimension=vv.shape[0]):
+        for cols in column_blocks( vv.shape[0], vv.shape[1], vv.dtype.itemsize ):
+            block = np.asarray( vv[:, cols] )
+            accumulate = precision.matching_dtype( np.result_type(block.dtype, *[ op.dtype for op in operators ]), precision.accumulate_dtype() )
+            proy.append( [ np.real( np.einsum( 'ij,ij->j', block.conj(), operator @ block, dtype=accumulate ) ) for operator in operators ] )
+    return np.concatenate( [ np.array(p) for p in proy ], axis=-1 )
+
+
 """
 WORKFLOWS
 """
@@ -137,53 +322,93 @@ WORKFLOWS
 Funcion que calcula el calor especifico para un conjunto de temperaturas
 input: 
     - op (numpy array): Operador hermitiano al que se le quiere calcular el
-    calor especifico
+    calor especifico (tambien se acepta una matriz sparse, un BlockHamiltonian o un Spectrum)
     - temp (numpy array): Arreglo con las temperaturas
     - pre (int): Entero positivo que indica la precision para calculos grandes
+    - compress_tol (float): Si no es None el espectro se comprime en niveles degenerados con esta tolerancia
 output:
     - Valor del calor especifico en cada temperatura
 """
-def specific_heat_workflow(op: np.array, temp: np.array, pre: int, parallel_flag: bool, parallel_vars: dict) -> np.array:
-    ee = np.linalg.eigvalsh(op)
+def specific_heat_workflow(op: np.array, temp: np.array, pre: int, parallel_flag: bool, parallel_vars: dict, compress_tol: float = None) -> np.array:
+    ee = diagonalize(op)
+    degeneracy = None
+    if compress_tol is not None:
+        ee, degeneracy, _ = compress_spectrum(ee, None, compress_tol)
     if parallel_flag:
-        return np.array( parallel_wrapper( specific_heat, temp, ee, None, pre, parallel_vars ) )
+        return np.array( parallel_wrapper( specific_heat, temp, ee, None, pre, parallel_vars, degeneracy ) )
     else:
-        return np.array( [ specific_heat(ee, None, t, pre) for t in temp ] )
+        return thermal_quantities(ee, temp, degeneracy=degeneracy)["specific_heat"]
 
 
 """ 
 Funcion que calcula la entropia para un conjunto de temperaturas
 input: 
     - op (numpy array): Operador hermitiano al que se le quiere calcular la entropia
+    (tambien se acepta una matriz sparse, un BlockHamiltonian o un Spectrum)
     - temp (numpy array): Arreglo con las temperaturas
     - pre (int): Entero positivo que indica la precision para calculos grandes
+    - compress_tol (float): Si no es None el espectro se comprime en niveles degenerados con esta tolerancia
 output:
     - Valor de la entropia en cada temperatura
 """
-def entropy_workflow(op: np.array, temp: np.array, pre: int, parallel_flag: bool, parallel_vars: dict) -> np.array:
-    ee = np.linalg.eigvalsh(op)
+def entropy_workflow(op: np.array, temp: np.array, pre: int, parallel_flag: bool, parallel_vars: dict, compress_tol: float = None) -> np.array:
+    ee = diagonalize(op)
+    degeneracy = None
+    if compress_tol is not None:
+        ee, degeneracy, _ = compress_spectrum(ee, None, compress_tol)
     if parallel_flag:
-        return np.array( parallel_wrapper( entropy, temp, ee, None, pre, parallel_vars) )
+        return np.array( parallel_wrapper( entropy, temp, ee, None, pre, parallel_vars, degeneracy ) )
     else:
-        return np.array( [ entropy(ee, None, t, pre) for t in temp ] )
+        return thermal_quantities(ee, temp, degeneracy=degeneracy)["entropy"]
 
 
 """ 
 Funcion que calcula el valor esperado de un operador
 input: 
     - op_base (numpy array): Operador hermitiano al que se le toman los valores y vectores propios
+    (tambien se acepta una matriz sparse, un BlockHamiltonian o un Spectrum)
     - operator (numpy array): Operador al que se le calcula el valor esperado
     - temp (numpy array): Arreglo con las temperaturas
     - pre (int): Entero positivo que indica la precision para calculos grandes
+    - compress_tol (float): Si no es None el espectro se comprime en niveles degenerados con esta tolerancia
 output:
     - Arreglo de los valores esperados a diferentes temperaturas
 """
-def expected_value_workflow(op_base: np.array, operator: np.array, temp: np.array, pre: int, parallel_flag: bool, parallel_vars: dict) -> np.array:
-    ee, vv = np.linalg.eigh(op_base)
-    proy = np.array( [ ((vv[:,k]).T.conj()).dot(operator).dot(vv[:,k]) for k in range(len(ee))] )
+def expected_value_workflow(op_base: np.array, operator: np.array, temp: np.array, pre: int, parallel_flag: bool, parallel_vars: dict, compress_tol: float = None) -> np.array:
+    ee, vv = diagonalize(op_base, True)
+    proy = projections(vv, [operator])[0]
+    degeneracy = None
+    if compress_tol is not None:
+        ee, degeneracy, proy = compress_spectrum(ee, proy, compress_tol)
     if parallel_flag:
-        return np.array( parallel_wrapper( valor_esperado, temp, ee, proy, pre, parallel_vars ) )
+        return np.array( parallel_wrapper( valor_esperado, temp, ee, proy, pre, parallel_vars, degeneracy ) )
     else:
-        return np.array( [ valor_esperado(ee, proy, t, pre) for t in temp ] )
+        return thermal_quantities(ee, temp, proy, degeneracy=degeneracy)["expected"]
+
+
 
 
+""" 
+Funcion que calcula el valor esperado de varios operadores, las proyecciones se calculan en bloque y los
+pesos de Boltzmann se comparten entre todos los operadores. En paralelo siempre se usa el modo por bloques.
+input: 
+    - op_base (numpy array): Operador hermitiano al que se le toman los valores y vectores propios
+    (tambien se acepta una matriz sparse, un BlockHamiltonian o un Spectrum)
+    - operators (list): Lista de operadores, cada uno puede ser una matriz densa, sparse o un string
+    - temp (numpy array): Arreglo con las temperaturas
+    - pre (int): Entero positivo que indica la precision para calculos grandes
+    - compress_tol (float): Si no es None el espectro se comprime en niveles degenerados con esta tolerancia
+    - spins ([float]): Lista del valor del spin en cada uno de los sitios, solo necesaria si hay operadores como string
+output:
+    - Arreglo (operadores, temperaturas) de los valores esperados
+"""
+def expected_values_workflow(op_base: np.array, operators: list, temp: np.array, pre: int, parallel_flag: bool, parallel_vars: dict, compress_tol: float = None, spins: list = None) -> np.array:
+    ee, vv = diagonalize(op_base, True)
+    proy = projections(vv, operators, spins)
+    degeneracy = None
+    if compress_tol is not None:
+        ee, degeneracy, proy = compress_spectrum(ee, proy, compress_tol)
+    if parallel_flag:
+        return chunked_wrapper( "expected", temp, ee, proy, parallel_vars, degeneracy )
+    else:
+        return thermal_quantities(ee, temp, proy, degeneracy=degeneracy)["expected"]
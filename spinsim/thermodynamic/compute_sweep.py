@@ -0,0 +1,186 @@
+import os
+import json
+import hashlib
+import zipfile
+import numpy as np
+import scipy as sc
+from spinsim.hamiltonian.build_hamiltonian import construct_sparse_term
+from spinsim.hamiltonian.build_spectrum import spectrum_key
+from .compute_observables import thermal_quantities, projections
+from spinsim import instrumentation, precision
+
+
+"""
+Construir una sola vez la matriz de cada operador distinto de la lista de terminos
+input:
+    - operator ([string]): Lista de [exchange, string], cada uno representa un termino del hamiltoniano
+    - spines ([float]): Lista del valor del spin en cada uno de los sitios
+output:
+    - Diccionario con el string de cada operador y su matriz sparse
+"""
+def construct_sweep_terms(list_operators: list, spins: list) -> dict:
+    matrices = {}
+    for (_, op) in list_operators:
+        if op not in matrices:
+            matrices[op] = construct_sparse_term(op, spins)
+    return matrices
+
+
+"""
+Construir el hamiltoniano de un punto del barrido como suma ponderada de las matrices precalculadas
+input:
+    - operator ([string]): Lista de [exchange, string], el exchange puede ser un numero o el nombre de un parametro
+    - matrices (dict): Matrices de cada operador (ver construct_sweep_terms)
+    - point (dict): Valor de cada parametro en el punto
+output:
+    - Arreglo de numpy que representa el hamiltoniano, con la precision de almacenamiento de spinsim.precision
+"""
+def sweep_hamiltonian(list_operators: list, matrices: dict, point: dict) -> np.array:
+    base = None
+    for (exchange, op) in list_operators:
+        value = point[exchange] if isinstance(exchange, str) else exchange
+        term = value*matrices[op]
+        base = term if base is None else base + term
+    return base.toarray().astype( precision.matching_dtype(base.dtype, precision.storage_dtype()), copy=False )
+
+
+"""
+Calcular los observables de un punto del barrido, si se ingresa un archivo el resultado se guarda en el
+junto con el punto
+input:
+    - operator ([string]): Lista de [exchange, string], el exchange puede ser un numero o el nombre de un parametro
+    - matrices (dict): Matrices de cada operador (ver construct_sweep_terms)
+    - point (dict): Valor de cada parametro en el punto
+    - temp (numpy array): Arreglo de temperaturas
+    - observables ([string]): Cantidades de thermal_quantities a calcular (por ejemplo specific_heat, entropy, energy)
+    - operators (dict): Nombre y matriz de los operadores a los que se les calcula el valor esperado
+    - path (string): Archivo .npz del checkpoint, puede ser None
+    - key (string): Llave del barrido guardada junto al checkpoint (ver sweep_key)
+output:
+    - Arreglo de tamaño (observables + operadores, temperaturas)
+"""
+def sweep_point(list_operators: list, matrices: dict, point: dict, temp: np.array, observables: list, operators: dict, path: str = None, key: str = "") -> np.array:
+    ham = sweep_hamiltonian(list_operators, matrices, point)
+    values = []
+    with instrumentation.stage("diagonalize", vectors=len(operators) > 0) as record:
+        record.add_matrix("operator", ham)
+        if len(operators) > 0:
+            ee, vv = np.linalg.eigh(ham)
+        else:
+            ee = np.linalg.eigvalsh(ham)
+
+    proy = None
+    if len(operators) > 0:
+        proy = projections(vv, list(operators.values()))
+    quantities = thermal_quantities(ee, temp, proy)
+    values += [ quantities[name] for name in observables ]
+    if proy is not None:
+        values += list( quantities["expected"] )
+
+    values = np.array(values)
+    if path is not None:
+        # Se escribe en un archivo temporal y se reemplaza, de forma que un proceso interrumpido no deja
+        # un checkpoint incompleto
+        temporal = "%s.%d.tmp"%(path, os.getpid())
+        with open(temporal, "wb") as f:
+            np.savez( f, values=values, point=json.dumps(point, sort_keys=True), key=key )
+        os.replace(temporal, path)
+    return values
+
+
+"""
+Calcular una llave (sha256) que identifica un barrido, a partir de sus terminos y espines (ver spectrum_key),
+temperaturas, observables y operadores. Los checkpoints con otra llave no se usan.
+input:
+    - operator ([string]): Lista de [exchange, string], el exchange puede ser un numero o el nombre de un parametro
+    - spines ([float]): Lista del valor del spin en cada uno de los sitios
+    - temp (numpy array): Arreglo de temperaturas
+    - observables ([string]): Cantidades de thermal_quantities a calcular
+    - operators (dict): Nombre y matriz de los operadores a los que se les calcula el valor esperado
+output:
+    - String hexadecimal con la llave
+"""
+def sweep_key(list_operators: list, spins: list, temp: np.array, observables: list, operators: dict) -> str:
+    digest = hashlib.sha256( spectrum_key(list_operators, spins).encode() )
+    digest.update( np.ascontiguousarray(temp, dtype='float64').tobytes() )
+    digest.update( json.dumps( [ list(observables), list(operators.keys()) ] ).encode() )
+    for operator in operators.values():
+        if sc.sparse.issparse(operator):
+            operator = operator.tocsr()
+            arrays = [ operator.data, operator.indices, operator.indptr ]
+        else:
+            arrays = [ np.asarray(operator) ]
+        for array in arrays:
+            digest.update( np.ascontiguousarray(array).tobytes() )
+    return digest.hexdigest()
+
+
+"""
+Leer el checkpoint de un punto, solo se acepta si el punto y la llave del barrido guardados son los mismos.
+Un archivo que no se puede leer se considera inexistente.
+"""
+def load_checkpoint(path: str, point: dict, key: str = "") -> np.array:
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            if str(data["point"]) != json.dumps(point, sort_keys=True) or str(data["key"]) != key:
+                return None
+            return data["values"]
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        return None
+
+
+"""
+Barrido de parametros de una familia de hamiltonianos. Las matrices de cada operador se construyen una sola vez,
+en cada punto solo se hace la suma ponderada, la diagonalizacion y el calculo de los observables, que se pueden
+paralelizar con dask. Con checkpoint_dir cada punto terminado se guarda en disco y al volver a ejecutar el barrido
+solo se calculan los puntos que faltan, los checkpoints de un barrido con otros terminos, espines, temperaturas,
+observables u operadores se recalculan (ver sweep_key).
+input:
+    - operator ([string]): Lista de [exchange, string], el exchange puede ser un numero o el nombre de un parametro
+    - spines ([float]): Lista del valor del spin en cada uno de los sitios
+    - points ([dict]): Lista de puntos, cada uno con el valor de los parametros
+    - temp (numpy array): Arreglo de temperaturas
+    - observables ([string]): Cantidades de thermal_quantities a calcular (por ejemplo specific_heat, entropy, energy)
+    - operators (dict): Nombre y matriz de los operadores a los que se les calcula el valor esperado
+    - parallel_flag (bool): Calcular los puntos en paralelo
+    - parallel_vars (dict): scheduler y num_workers de dask
+    - checkpoint_dir (string): Carpeta de los checkpoints, puede ser None
+output:
+    - Diccionario con points, labels (nombre de cada observable), temperature y values, un arreglo de tamaño
+    (puntos, observables, temperaturas)
+"""
+def sweep_workflow(list_operators: list, spins: list, points: list, temp: np.array, observables: list, operators: dict = None, parallel_flag: bool = False, parallel_vars: dict = None, checkpoint_dir: str = None) -> dict:
+    operators = {} if operators is None else operators
+    matrices = construct_sweep_terms(list_operators, spins)
+    key = ""
+    if checkpoint_dir is not None:
+        os.makedirs( checkpoint_dir, exist_ok=True )
+        key = sweep_key(list_operators, spins, temp, observables, operators)
+
+    values = [ None for _ in points ]
+    pending = []
+    for i, point in enumerate(points):
+        path = None if checkpoint_dir is None else os.path.join( checkpoint_dir, "point_%d.npz"%i )
+        if path is not None:
+            values[i] = load_checkpoint(path, point, key)
+        if values[i] is None:
+            pending.append( (i, point, path) )
+        else:
+            instrumentation.count("sweep_checkpoint_hit")
+
+    if parallel_flag:
+        import dask as dk
+        # Las matrices se agregan una sola vez al grafo de dask
+        matrices_d = dk.delayed(matrices, pure=True)
+        pre_compute_values = [ dk.delayed(sweep_point)(list_operators, matrices_d, point, temp, observables, operators, path, key)
+            for (_, point, path) in pending ]
+        results = dk.compute( *pre_compute_values, scheduler=parallel_vars['scheduler'], num_workers=parallel_vars['num_workers'] )
+    else:
+        results = [ sweep_point(list_operators, matrices, point, temp, observables, operators, path, key) for (_, point, path) in pending ]
+
+    for (i, _, _), result in zip(pending, results):
+        values[i] = result
+    return { "points": points, "labels": list(observables) + list(operators.keys()),
+        "temperature": np.asarray(temp), "values": np.array(values) }
@@ -0,0 +1,37 @@
+import spinsim as ss
+import numpy as np
+
+
+def test_quench_two_spins():
+    terminos = [ [1.0, op] for op in ss.operators.sij_vector((0,1), 2) ]
+    H = ss.hamiltonian.construct_hamiltonian(terminos, [0.5, 0.5], sparse_flag=True)
+    state = np.array([0, 1, 0, 0])
+    times = np.linspace(0, 6, 13)
+
+    pasos = list( ss.dynamics.quench_workflow(H, state, times, [0.5, 0.5], { "zz": "ZZ" }, True) )
+    assert len(pasos) == times.shape[0]
+    for paso in pasos:
+        t = paso["time"]
+        assert np.abs( paso["echo"] - np.cos(t/2)**2 ) <= 1e-7
+        assert np.allclose( paso["magnetization"], [0.5*np.cos(t), -0.5*np.cos(t)] )
+        assert np.abs( paso["zz"] + 0.25 ) <= 1e-7
+    assert np.abs( pasos[0]["entropy"][0] ) <= 1e-7
+
+
+def test_evolve_linear_operator():
+    size = 6
+    espines = [ 0.5 ]*size
+    terminos = []
+    for op in ss.operators.set_sij_vector([ (i, i+1) for i in range(size-1) ], size):
+        terminos += [ [1.0, op[0]], [1.0, op[1]], [0.5, op[2]] ]
+    H = ss.hamiltonian.construct_hamiltonian(terminos, espines, sparse_flag=True)
+    L = ss.hamiltonian.construct_linear_operator(terminos, espines)
+    rng = np.random.default_rng(0)
+    state = rng.normal(size=2**size)
+    state = state/np.linalg.norm(state)
+    times = [0.5, 1.0, 2.5]
+
+    w, v = np.linalg.eigh( H.toarray() )
+    for (t1, s1), (t2, s2) in zip( ss.dynamics.evolve_state(H, state, times), ss.dynamics.evolve_state(L, state, times) ):
+        exacto = v @ ( np.exp(-1j*w*t1)*(v.conj().T @ state) )
+        assert np.allclose( s1, exacto ) and np.allclose( s2, exacto )
@@ -1,5 +1,6 @@
 import spinsim as ss
 import numpy as np
+import pytest
 
 def test_hamiltonian_matrix():
     ##Matrix using the library
@@ -18,3 +19,184 @@ def test_hamiltonian_matrix():
     sz = 0.5*np.array([[1,0], [0,-1]])
     H2 = np.real( np.kron( sx, sx ) + np.kron( sy, sy ) + np.kron( sz, sz ) )
     assert np.array_equal( H, H2 )
+
+
+def test_sparse_hamiltonian():
+    espines = [ 0.5, 1.0, 0.5 ]
+    SiSjvectores = ss.operators.set_sij_vector([ (0,1), (1,2), (0,2) ], 3)
+    terminos = []
+    for J, op in zip([1.0, -0.5, 0.3], SiSjvectores):
+        terminos += [ [J, op[0]], [J, op[1]], [J, op[2]] ]
+    H = ss.hamiltonian.construct_hamiltonian(terminos, espines)
+    Hs = ss.hamiltonian.construct_hamiltonian(terminos, espines, sparse_flag=True)
+    assert ss.hamiltonian.infer_dtype(terminos) == np.float64
+    assert Hs.format == 'csr' and Hs.dtype == np.float64
+    assert np.allclose( Hs.toarray(), H )
+
+
+def test_sparse_hamiltonian_complex():
+    # Un solo operador Y produce un termino imaginario
+    terminos = [ [1.0, "XY"], [1.0, "YX"] ]
+    H = ss.hamiltonian.construct_hamiltonian(terminos, [0.5, 0.5], sparse_flag=True)
+    sx = 0.5*np.array([[0,1], [1,0]])
+    sy = 0.5*np.array([[0,-1j], [1j,0]])
+    assert H.dtype == np.complex128
+    assert np.allclose( H.toarray(), np.kron(sx, sy) + np.kron(sy, sx) )
+
+
+def test_kron_cache():
+    ss.hamiltonian.clear_kron_cache()
+    size = 6
+    espines = [ 0.5 ]*size
+    terminos = []
+    for op in ss.operators.set_sij_vector([ (i, (i+1)%size) for i in range(size) ], size):
+        terminos += [ [1.0, op[0]], [1.0, op[1]], [1.0, op[2]] ]
+    H = ss.hamiltonian.construct_hamiltonian(terminos, espines)
+
+    # Los enlaces a primeros vecinos comparten la seccion "XX", "YY" y "ZZ"
+    info = ss.hamiltonian.kron_cache_info()
+    assert info["local_core"]["hits"] == 3*(size-2)
+    # El enlace (0, N-1) ocupa todo el sistema, por lo que no se guarda en cache
+    assert info["local_core"]["currsize"] == 3
+    assert info["local_core"]["bytes"] == sum( ss.hamiltonian.sparse_bytes( ss.hamiltonian.construct_sparse_term(op, [0.5]*2) ) for op in ["XX", "YY", "ZZ"] )
+
+    sigma = { "I": np.eye(2), "X": 0.5*np.array([[0,1], [1,0]]),
+        "Y": 0.5*np.array([[0,-1j], [1j,0]]), "Z": 0.5*np.array([[1,0], [0,-1]]) }
+    H2 = np.zeros( (2**size, 2**size), dtype=complex )
+    for J, op in terminos:
+        term = np.eye(1)
+        for o in op:
+            term = np.kron(term, sigma[o])
+        H2 += J*term
+    assert np.allclose( H, H2 )
+
+
+def test_kron_cache_bytes(monkeypatch):
+    ss.hamiltonian.clear_kron_cache()
+    espines = [ 1.0 ]*4
+    core = ss.hamiltonian.sparse_bytes( ss.hamiltonian.kron_section( (1.0, 1.0, 1.0), "XIX" ) )
+    monkeypatch.setattr(ss.hamiltonian.build_hamiltonian, "core_cache_bytes", core + 1)
+    ss.hamiltonian.construct_sparse_term("XIXI", espines)
+    ss.hamiltonian.construct_sparse_term("ZZII", espines)
+    info = ss.hamiltonian.kron_cache_info()["local_core"]
+    # La segunda seccion no cabe junto a la primera, que se descarta
+    assert info["currsize"] == 1 and info["bytes"] <= core + 1
+    assert np.allclose( ss.hamiltonian.construct_term("IXIX", espines), np.kron( np.eye(3), ss.hamiltonian.construct_term("XIX", espines[:3]) ) )
+    ss.hamiltonian.clear_kron_cache()
+
+
+def test_linear_operator():
+    size = 6
+    espines = [ 0.5, 1.0 ]*(size//2)
+    terminos = []
+    for op in ss.operators.set_sij_vector([ (i, (i+1)%size) for i in range(size) ], size):
+        terminos += [ [1.0, op[0]], [0.7, op[1]], [0.4, op[2]] ]
+    terminos += [ [0.3, op] for op in ss.operators.magnetic_vector(size)[0] ]
+    H = ss.hamiltonian.construct_hamiltonian(terminos, espines)
+    L = ss.hamiltonian.construct_linear_operator(terminos, espines)
+    states = np.random.default_rng(0).normal(size=(H.shape[0], 3))
+    assert L.dtype == np.float64
+    assert np.allclose( L @ states, H @ states )
+    assert np.allclose( L.matvec(states[:,0]), H @ states[:,0] )
+
+    # Un solo operador Y produce un termino imaginario
+    L = ss.hamiltonian.construct_linear_operator([ [1.0, "XY"] ], [0.5, 0.5])
+    H = ss.hamiltonian.construct_hamiltonian([ [1.0, "XY"] ], [0.5, 0.5])
+    assert L.dtype == np.complex128
+    assert np.allclose( L @ np.eye(4), H )
+
+
+def xxz_chain(espines: list, field: float) -> list:
+    size = len(espines)
+    terminos = []
+    for op in ss.operators.set_sij_vector([ (i, (i+1)%size) for i in range(size) ], size):
+        terminos += [ [1.0, op[0]], [1.0, op[1]], [0.6, op[2]] ]
+    terminos += [ [field, op] for op in ss.operators.magnetic_vector(size)[2] ]
+    return terminos
+
+
+def test_block_hamiltonian():
+    espines = [ 0.5, 1.0, 0.5, 1.5 ]
+    terminos = xxz_chain(espines, 0.2)
+    H = ss.hamiltonian.construct_hamiltonian(terminos, espines)
+    B = ss.hamiltonian.construct_block_hamiltonian(terminos, espines)
+    assert sum( b.shape[0] for b in B.blocks.values() ) == H.shape[0]
+    assert np.allclose( B.toarray(), H )
+    assert np.allclose( B.eigvalsh(), np.linalg.eigvalsh(H) )
+    ee, vv = B.eigh()
+    assert np.allclose( vv @ np.diag(ee) @ vv.T.conj(), H )
+
+
+def test_block_hamiltonian_no_conservation():
+    terminos = [ [1.0, "XI"], [1.0, "ZZ"] ]
+    try:
+        ss.hamiltonian.construct_block_hamiltonian(terminos, [0.5, 0.5])
+        assert False
+    except ValueError:
+        pass
+
+
+def test_momentum_blocks():
+    for espines in [ [0.5]*6, [1.0]*4 ]:
+        terminos = xxz_chain(espines, 0.2)
+        H = ss.hamiltonian.construct_hamiltonian(terminos, espines)
+        for sz_flag in [True, False]:
+            B = ss.hamiltonian.construct_block_hamiltonian(terminos, espines, sz_flag=sz_flag, translation_flag=True)
+            assert sum( b.shape[0] for b in B.blocks.values() ) == H.shape[0]
+            assert np.allclose( B.eigvalsh(), np.linalg.eigvalsh(H) )
+            ee, vv = B.eigh()
+            assert np.allclose( vv @ np.diag(ee) @ vv.T.conj(), H )
+
+    # Cadena abierta, no es invariante bajo traslaciones
+    terminos = [ t for t in xxz_chain([0.5]*4, 0.0) if t[1][0] == 'I' or t[1][-1] == 'I' ]
+    try:
+        ss.hamiltonian.construct_block_hamiltonian(terminos, [0.5]*4, translation_flag=True)
+        assert False
+    except ValueError:
+        pass
+
+
+def test_spin_table():
+    for spin in [ 0.5, 1.0, 1.5, 3.0 ]:
+        m = ss.hamiltonian.pauli_matrices(spin)
+        X, Y, Z = m["X"].toarray(), m["Y"].toarray(), m["Z"].toarray()
+        assert np.allclose( X@Y - Y@X, 1j*Z )
+        assert np.allclose( m["+"].toarray(), X + 1j*Y )
+        assert np.allclose( m["-"].toarray(), X - 1j*Y )
+        assert np.allclose( X@X + Y@Y + Z@Z, m["S2"].toarray() )
+        assert ss.hamiltonian.pauli_matrices(spin) is m
+        assert not m["X"].data.flags.writeable
+
+    # S+S- + S-S+ = 2(SxSx + SySy)
+    H = ss.hamiltonian.construct_hamiltonian([ [0.5, "+-"], [0.5, "-+"] ], [1.0, 0.5])
+    H2 = ss.hamiltonian.construct_hamiltonian([ [1.0, "XX"], [1.0, "YY"] ], [1.0, 0.5])
+    assert np.allclose( H, H2 )
+
+
+def test_precision_policy():
+    espines = [0.5, 1.0, 0.5]
+    terminos = [ [0.7, op] for op in ss.operators.sij_vector((0,1), 3) ]
+    dm = ss.operators.antisymmetric_exchange_sum([ (1,2) ], [ (0.3, -0.2, 0.5) ], 3).to_list()
+    H = ss.hamiltonian.construct_hamiltonian(terminos + dm, espines)
+
+    with ss.precision.precision_policy('float32', 'float64'):
+        assert ss.hamiltonian.infer_dtype(terminos) == np.float32
+        assert ss.hamiltonian.infer_dtype(terminos + dm) == np.complex64
+        denso = ss.hamiltonian.construct_hamiltonian(terminos + dm, espines)
+        sparse = ss.hamiltonian.construct_hamiltonian(terminos + dm, espines, sparse_flag=True)
+        L = ss.hamiltonian.construct_linear_operator(terminos + dm, espines)
+        v = np.random.default_rng(1).normal(size=H.shape[0]).astype(np.complex64)
+        assert denso.dtype == np.complex64 and sparse.dtype == np.complex64
+        assert (L @ v).dtype == np.complex64
+    assert ss.precision.storage_dtype() == np.float64
+
+    assert np.allclose( denso, H, atol=1e-6 )
+    assert np.allclose( sparse.toarray(), H, atol=1e-6 )
+    assert np.allclose( L @ v, H @ v, atol=1e-5 )
+    # Los terminos de Dzyaloshinskii–Moriya no se pueden representar con un tipo real
+    with pytest.raises(ValueError):
+        ss.hamiltonian.construct_hamiltonian(terminos + dm, espines, dtype=np.float64)
+    with pytest.raises(ValueError):
+        ss.hamiltonian.construct_linear_operator(terminos + dm, espines, dtype=np.float32)
+    with pytest.raises(ValueError):
+        ss.precision.set_precision('float64', 'float32')
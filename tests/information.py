@@ -26,3 +26,150 @@ def test_fidelity2():
     state1 = np.array([0,1])
     state2 = np.array([1,0])
     assert np.abs( ss.information.fidelity_states(state1, state2) ) <= 1e-7
+
+
+def test_count_rep_gs():
+    assert ss.information.count_rep_gs(np.array([-1.0, -1.0, 0.5]), 1e-7) == 2
+    assert ss.information.count_rep_gs(np.array([-1.0, 0.5]), 1e-7) == 1
+    assert ss.information.count_rep_gs(np.array([0.0, 0.0]), 1e-7) == -1
+
+
+def test_ground_states_lanczos():
+    size = 8
+    espines = [ 0.5 ]*size
+    terminos = []
+    for op in ss.operators.set_sij_vector([ (i, (i+1)%size) for i in range(size) ], size):
+        terminos += [ [1.0, op[0]], [1.0, op[1]], [1.0, op[2]] ]
+    H = ss.hamiltonian.construct_hamiltonian(terminos, espines)
+    L = ss.hamiltonian.construct_linear_operator(terminos, espines)
+    ee, vv = ss.information.ground_states(H)
+    ee2, vv2 = ss.information.ground_states(L, k=2)
+    assert ee.shape[0] == ee2.shape[0] == 1
+    assert np.abs( ee[0] - ee2[0] ) <= 1e-7
+    assert np.abs( 1 - ss.information.fidelity_states(vv[:,0], vv2[:,0]) ) <= 1e-7
+
+
+def test_entanglement_entropy_singlet():
+    terminos = [ [1.0, op] for op in ss.operators.sij_vector((0,1), 2) ]
+    H = ss.hamiltonian.construct_hamiltonian(terminos, [0.5, 0.5], sparse_flag=True)
+    entropias = ss.information.entanglement_entropy_per_site_gs(H, [0.5, 0.5], False, None, k=1)
+    assert np.allclose( entropias, [0.0, np.log(2)] )
+
+
+def test_partial_trace_subsets():
+    espines = [ 0.5, 1.0, 0.5 ]
+    dims = [ 2, 3, 2 ]
+    rng = np.random.default_rng(1)
+    state = rng.normal(size=12) + 1j*rng.normal(size=12)
+    state = state/np.linalg.norm(state)
+    rho = np.outer(state, state.conj())
+
+    # Traza explicita sobre los indices del tensor
+    tensor = rho.reshape(dims + dims)
+    assert np.allclose( ss.information.partial_trace(rho, espines, [0, 2]), np.einsum('ajbcjd->abcd', tensor).reshape(4, 4) )
+    assert np.allclose( ss.information.partial_trace(rho, espines, [1]), np.einsum('ajbacb->jc', tensor) )
+    assert np.allclose( ss.information.partial_trace(rho, espines, [2, 0]), ss.information.partial_trace(rho, espines, [0, 2]) )
+
+    reducidas = ss.information.partial_trace_sweep(rho, espines)
+    for i, reducida in enumerate(reducidas):
+        assert np.allclose( reducida, ss.information.partial_trace_lr(rho, espines, i) )
+        assert np.allclose( reducida, ss.information.partial_trace(rho, espines, list(range(i, 3))) )
+
+
+def test_schmidt_values():
+    espines = [ 0.5, 1.0, 0.5 ]
+    rng = np.random.default_rng(2)
+    vv = rng.normal(size=(12, 2)) + 1j*rng.normal(size=(12, 2))
+    vv, _ = np.linalg.qr(vv)
+    pp = [ 0.3, 0.7 ]
+    rho = sum( p*np.outer(vv[:,k], vv[:,k].conj()) for k, p in enumerate(pp) )
+    for i in range(3):
+        valores = np.sort( ss.information.schmidt_values(vv, pp, espines, i) )[::-1]
+        esperado = np.sort( np.linalg.eigvalsh( ss.information.partial_trace_lr(rho, espines, i) ) )[::-1]
+        n = min( valores.shape[0], esperado.shape[0] )
+        assert np.allclose( valores[:n], esperado[:n] )
+        assert np.allclose( esperado[n:], 0 )
+
+
+def test_entanglement_entropy_chain():
+    size = 6
+    espines = [ 0.5 ]*size
+    terminos = []
+    for op in ss.operators.set_sij_vector([ (i, i+1) for i in range(size-1) ], size):
+        terminos += [ [1.0, op[0]], [1.0, op[1]], [1.0, op[2]] ]
+    H = ss.hamiltonian.construct_hamiltonian(terminos, espines)
+    entropias = ss.information.entanglement_entropy_per_site_gs(H, espines, False, None)
+
+    # Comparar con la matriz densidad completa
+    ee, vv = ss.information.ground_states(H)
+    rho = np.outer(vv[:,0], vv[:,0].conj())
+    esperado = [ ss.information.von_neumann_entropy( np.linalg.eigvalsh(r) ) for r in ss.information.partial_trace_sweep(rho, espines) ]
+    assert np.allclose( entropias, esperado )
+    assert np.allclose( entropias[1:], entropias[1:][::-1] )
+
+
+def test_thermal_entanglement_workflow():
+    espines = [ 0.5, 1.0, 0.5 ]
+    terminos = []
+    for op in ss.operators.set_sij_vector([ (0,1), (1,2), (0,2) ], 3):
+        terminos += [ [1e-3, op[0]], [1e-3, op[1]], [5e-4, op[2]] ]
+    H = ss.hamiltonian.construct_hamiltonian(terminos, espines)
+    temp = np.linspace(1, 50, 7)
+    ee, vv = np.linalg.eigh(H)
+
+    params = { 'scheduler': 'threads', 'num_workers': 2 }
+    for keep in [ [0, 2], [1] ]:
+        serial = ss.information.thermal_entanglement_workflow(H, espines, keep, temp, False, None)
+        paralelo = ss.information.thermal_entanglement_workflow(H, espines, keep, temp, True, params)
+        for i, t in enumerate(temp):
+            p = np.exp( -(ee - ee[0])/(ss.information.boltz*t) )
+            p = p/np.sum(p)
+            rho = ss.information.partial_trace( (vv*p) @ vv.conj().T, espines, keep )
+            assert np.abs( serial["entropy"][i] - ss.information.von_neumann_entropy( np.linalg.eigvalsh(rho) ) ) <= 1e-7
+            assert np.abs( serial["concurrence"][i] - np.real( ss.information.concurrence(rho) ) ) <= 1e-7
+        assert np.allclose( serial["entropy"], paralelo["entropy"] )
+        assert np.allclose( serial["concurrence"], paralelo["concurrence"] )
+
+        # Con dA*dA > D ([0, 2]) no se construyen las matrices reducidas de cada vector, ambos caminos coinciden
+        bloques = ss.information.thermal_entanglement_block(ee, ss.information.reduced_eigenvector_blocks(vv, espines, keep), temp)
+        estados = ss.information.thermal_entanglement_states_block(ee, ss.information.eigenvector_tensor(vv, espines, keep), temp)
+        assert np.allclose( bloques, estados )
+
+
+def test_density_matrix_store(tmp_path, monkeypatch):
+    espines = [ 0.5, 1.0, 0.5 ]
+    rng = np.random.default_rng(3)
+    estados = [ s/np.linalg.norm(s) for s in rng.normal(size=(2, 12)) ]
+    rho = ss.information.construct_density_matrix(estados, [0.25, 0.75], (12, 12))
+    assert np.allclose( rho, 0.25*np.outer(estados[0], estados[0]) + 0.75*np.outer(estados[1], estados[1]) )
+
+    monkeypatch.setattr(ss.hamiltonian.build_spectrum, "block_bytes", 200)
+    stored = ss.information.construct_density_matrix(estados, [0.25, 0.75], (12, 12), str(tmp_path / "rho.npy"))
+    assert isinstance(stored, np.memmap)
+    assert np.allclose( stored, rho )
+    for i in range( len(espines) ):
+        assert np.allclose( ss.information.partial_trace_lr(stored, espines, i), ss.information.partial_trace_lr(rho, espines, i) )
+
+
+def test_thermal_entanglement_states_memory(monkeypatch):
+    import tracemalloc
+    size = 8
+    espines = [ 0.5 ]*size
+    terminos = []
+    for op in ss.operators.set_sij_vector([ (i, i+1) for i in range(size-1) ], size):
+        terminos += [ [1e-3, op[0]], [1e-3, op[1]], [1e-3, op[2]] ]
+    H = ss.hamiltonian.construct_hamiltonian(terminos, espines)
+    ee, vv = np.linalg.eigh(H)
+    keep = [0, 1, 2, 3, 4]
+    tensor = ss.information.eigenvector_tensor(vv, espines, keep)
+    temp = np.array([5.0, 20.0])
+    esperado = ss.information.thermal_entanglement_block(ee, ss.information.reduced_eigenvector_blocks(vv, espines, keep), temp)
+
+    # Bloques de 16 vectores, la memoria temporal debe ser mucho menor que rho(T)
+    monkeypatch.setattr(ss.hamiltonian.build_spectrum, "block_bytes", 16*vv.shape[0]*8)
+    tracemalloc.start()
+    valores = ss.information.thermal_entanglement_states_block(ee, tensor, temp)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert np.allclose( valores, esperado )
+    assert peak < vv.shape[0]*vv.shape[0]*8/2
@@ -0,0 +1,65 @@
+import spinsim as ss
+import numpy as np
+from spinsim import instrumentation
+
+
+def heisenberg_chain(size: int) -> list:
+    terminos = []
+    for op in ss.operators.set_sij_vector([ (i, i+1) for i in range(size-1) ], size):
+        terminos += [ [1e-3, op[0]], [1e-3, op[1]], [1e-3, op[2]] ]
+    return terminos
+
+
+def test_disabled_stage():
+    assert instrumentation.stage("construct_hamiltonian") is instrumentation.disabled_stage
+    instrumentation.count("mpmath_fallback")
+    assert len(instrumentation.active_reports) == 0
+
+
+def test_workflow_report():
+    espines = [0.5]*4
+    terminos = heisenberg_chain(4)
+    temp = np.linspace(1, 100, 20)
+    reports = []
+    with ss.instrument(memory_flag=True, callback=reports.append) as report:
+        H = ss.hamiltonian.construct_hamiltonian(terminos, espines, sparse_flag=True)
+        ss.thermodynamic.specific_heat_workflow(H, temp, 50, False, None)
+        ss.thermodynamic.entropy_workflow(H, temp, 50, True, { 'scheduler': 'threads', 'num_workers': 2, 'mode': 'chunked' })
+    assert reports == [report]
+    assert len(instrumentation.active_reports) == 0
+
+    names = [ record["name"] for record in report.stages ]
+    assert names.count("diagonalize") == 2
+    assert "chunked_wrapper" in names and "thermal_quantities" in names
+    build = report.stages[ names.index("construct_hamiltonian") ]
+    assert build["dimension"] == 16 and build["terms"] == len(terminos)
+    assert build["hamiltonian"]["shape"] == (16, 16)
+    assert build["hamiltonian"]["nnz"] == H.nnz
+    assert all( record["peak_bytes"] >= 0 and record["seconds"] >= 0 for record in report.stages )
+
+    summary = report.summary()
+    assert summary["diagonalize"]["calls"] == 2
+    # Con el scheduler 'threads' tambien se registra cada bloque del modo chunked
+    assert summary["thermal_quantities"]["calls"] == 3
+
+
+def test_mpmath_fallback_counter():
+    ee = np.array([0.0, 0.0])
+    with ss.instrument() as report:
+        # La suma de la funcion de particion diverge en punto flotante
+        partition = ss.thermodynamic.prob_states(ee, 1.0, 50, np.array([1e308, 1e308]))
+    assert report.counters["mpmath_fallback"] == 1
+    assert partition.shape == (2,) and np.all( np.isfinite(partition) )
+
+
+def test_nested_memory_peak():
+    with ss.instrument(memory_flag=True) as report:
+        with instrumentation.stage("outer"):
+            big = np.ones(2**18)
+            del big
+            with instrumentation.stage("inner"):
+                np.ones(2**10)
+    records = { record["name"]: record for record in report.stages }
+    assert records["inner"]["depth"] == 1 and records["outer"]["depth"] == 0
+    assert records["outer"]["peak_bytes"] >= 8*2**18
+    assert records["inner"]["peak_bytes"] < 8*2**18
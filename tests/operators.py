@@ -0,0 +1,82 @@
+import spinsim as ss
+import numpy as np
+
+
+def test_pauli_sum_merge():
+    terminos = [ [1.0, "XXI"], [0.5, "XXI"], [2.0, "IZZ"], [-2.0, "IZZ"], [1j, "YII"] ]
+    suma = ss.operators.PauliSum.from_list(terminos).simplify()
+    assert len(suma) == 2
+    assert sorted( suma.to_list(), key=lambda t: t[1] ) == [ [1.5, "XXI"], [1j, "YII"] ]
+
+    doble = suma + 2*suma - suma
+    assert dict( (op, J) for J, op in doble ) == { "XXI": 3.0, "YII": 2j }
+
+
+def test_pauli_sum_hamiltonian():
+    espines = [ 0.5, 1.0, 0.5 ]
+    indices = [ (0,1), (1,2), (0,2) ]
+    suma = ss.operators.sij_sum(indices, [1.0, -0.5, 0.3], 3) + ss.operators.sij_sum([ (0,1) ], [0.5], 3)
+    terminos = []
+    for J, op in zip([1.5, -0.5, 0.3], ss.operators.set_sij_vector(indices, 3)):
+        terminos += [ [J, op[0]], [J, op[1]], [J, op[2]] ]
+    assert len(suma) == 9
+    assert np.allclose( ss.hamiltonian.construct_hamiltonian(suma, espines), ss.hamiltonian.construct_hamiltonian(terminos, espines) )
+
+
+def test_antisymmetric_exchange_sum():
+    espines = [ 0.5, 0.5 ]
+    D = (0.1, 0.2, 0.3)
+    suma = ss.operators.antisymmetric_exchange_sum([ (0,1) ], [ D ], 2)
+    terminos = []
+    for d, ops in zip(D, ss.operators.antisymmetric_exchange_vector((0,1), 2)):
+        terminos += [ [d, ops[0]], [-d, ops[1]] ]
+    H = ss.hamiltonian.construct_hamiltonian(suma, espines)
+    assert np.allclose( H, ss.hamiltonian.construct_hamiltonian(terminos, espines) )
+    assert np.allclose( H, H.conj().T )
+
+
+def test_lattices():
+    casos = [ (ss.operators.chain_lattice(6, True), 6, 2),
+        (ss.operators.ladder_lattice(4, True), 8, 3),
+        (ss.operators.square_lattice(4, 3, True), 12, 4),
+        (ss.operators.triangular_lattice(3, 3, True), 9, 6),
+        (ss.operators.honeycomb_lattice(3, 3, True), 18, 3),
+        (ss.operators.kagome_lattice(3, 3, True), 27, 4) ]
+    for (bonds, kinds), size, coordinacion in casos:
+        assert np.all( bonds[:,0] < bonds[:,1] )
+        assert np.all( np.bincount( bonds.ravel(), minlength=size ) == coordinacion )
+        assert kinds.shape[0] == bonds.shape[0]
+
+    bonds, _ = ss.operators.chain_lattice(6, False)
+    assert bonds.tolist() == [ [i, i+1] for i in range(5) ]
+    bonds, kinds = ss.operators.square_lattice(3, 2, False)
+    assert bonds.shape[0] == 7 and np.sum(kinds == 1) == 3
+
+
+def test_bond_terms():
+    bonds, kinds = ss.operators.ladder_lattice(3, False)
+    J = ss.operators.bond_couplings(kinds, [1.0, 0.5])
+    terminos = ss.operators.bond_terms(bonds, J, 6, (1.0, 1.0, 0.8))
+
+    esperado = []
+    for j, op in zip(J, ss.operators.set_sij_vector([ tuple(b) for b in bonds ], 6)):
+        esperado += [ [j, op[0]], [j, op[1]], [0.8*j, op[2]] ]
+    assert terminos == esperado
+
+
+def test_lazy_import():
+    import sys
+    import subprocess
+    script = "import sys, spinsim.operators; print( [ m for m in ('dask', 'mpmath', 'scipy.sparse') if m in sys.modules ] )"
+    output = subprocess.run( [ sys.executable, "-c", script ], check=True, capture_output=True, text=True )
+    assert output.stdout.strip() == "[]"
+
+
+def test_star_import():
+    namespace = {}
+    exec( "from spinsim import *", namespace )
+    for name in ( "construct_hamiltonian", "specific_heat_workflow", "set_sij_vector", "partial_trace", "quench_workflow", "instrument" ):
+        assert name in namespace
+    assert not any( name in namespace for name in ( "_exported", "_submodules", "exported", "submodules" ) )
+    import spinsim
+    assert "construct_hamiltonian" in dir(spinsim)
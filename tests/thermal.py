@@ -1,37 +1,347 @@
 import spinsim as ss
 import numpy as np
+import pytest
+
+boltz = ss.thermodynamic.boltz
+delta = 1e-2
+ee_two = np.array([0.0, delta])
+temp = np.linspace(1, 300, 20)
+
+
+def two_level(t: np.array) -> tuple:
+    x = delta/(boltz*t)
+    p = np.exp(-x)/(1 + np.exp(-x))
+    calor = boltz*(x**2)*p*(1-p)
+    entropia = boltz*( np.log(1 + np.exp(-x)) + x*p )
+    return p, calor, entropia
+
+
+def heisenberg_triangle() -> tuple:
+    espines = [ 0.5, 1.0, 0.5 ]
+    terminos = []
+    for op in ss.operators.set_sij_vector([ (0,1), (1,2), (0,2) ], 3):
+        terminos += [ [1e-3, op[0]], [1e-3, op[1]], [5e-4, op[2]] ]
+    return ss.hamiltonian.construct_hamiltonian(terminos, espines), ss.hamiltonian.construct_term("ZII", espines)
+
 
 ##TESTEAR FUNCION DE PROBABILIDAD
 def test_distribucion_probabilidades():
-    assert True
+    p, _, _ = two_level(temp[3])
+    pp = ss.thermodynamic.prob_states(ee_two, temp[3], 50)
+    assert np.abs( np.sum(pp) - 1 ) <= 1e-7
+    assert np.abs( pp[1] - p ) <= 1e-7
+
+    # Temperatura muy baja, sin overflow
+    pp = ss.thermodynamic.prob_states(np.array([-1.0, 0.0]), 1e-3, 50)
+    assert np.allclose( pp, [1, 0] )
 
 ##TESTEAR FUNCIONES DE OBSERVABLES
 def test_specific_heat():
-    assert True
+    _, calor, _ = two_level(temp)
+    valores = [ ss.thermodynamic.specific_heat(ee_two, None, t, 50) for t in temp ]
+    assert np.allclose( valores, calor, rtol=1e-6 )
+    assert np.allclose( ss.thermodynamic.thermal_quantities(ee_two, temp)["specific_heat"], calor )
 
 def test_entropy():
-    assert True
+    _, _, entropia = two_level(temp)
+    valores = [ ss.thermodynamic.entropy(ee_two, None, t, 50) for t in temp ]
+    assert np.allclose( valores, entropia, rtol=1e-6 )
+    assert np.allclose( ss.thermodynamic.thermal_quantities(ee_two, temp)["entropy"], entropia )
 
 def test_expected_value():
-    assert True
+    p, _, _ = two_level(temp)
+    proy = np.array([1.0, -1.0])
+    valores = [ ss.thermodynamic.valor_esperado(ee_two, proy, t, 50) for t in temp ]
+    assert np.allclose( valores, 1 - 2*p, rtol=1e-6 )
+    assert np.allclose( ss.thermodynamic.thermal_quantities(ee_two, temp, proy)["expected"], 1 - 2*p )
+
+def test_thermal_quantities():
+    H, _ = heisenberg_triangle()
+    ee = np.linalg.eigvalsh(H)
+    t = np.concatenate( [ [1e-4, 1e-2], temp ] )
+    valores = ss.thermodynamic.thermal_quantities(ee, t, chunk_size=3)
+    log_z = [ ss.thermodynamic.log_z_function(ee, x, 50) for x in t ]
+    assert np.allclose( valores["log_z"], log_z )
+    beta = 1/(boltz*t[-1])
+    p = np.exp(-beta*ee)/np.sum(np.exp(-beta*ee))
+    assert np.abs( valores["energy"][-1] - np.sum(p*ee) ) <= 1e-12
+    assert np.abs( valores["energy2"][-1] - np.sum(p*ee**2) ) <= 1e-12
 
 ##TESTEAR WORKFLOW UN SOLO PROCESO
 def test_specific_heat_workflow():
-    assert True
+    H, _ = heisenberg_triangle()
+    ee = np.linalg.eigvalsh(H)
+    valores = ss.thermodynamic.specific_heat_workflow(H, temp, 50, False, None)
+    assert np.allclose( valores, [ ss.thermodynamic.specific_heat(ee, None, t, 50) for t in temp ] )
 
 def test_entropy_workflow():
-    assert True
+    H, _ = heisenberg_triangle()
+    ee = np.linalg.eigvalsh(H)
+    valores = ss.thermodynamic.entropy_workflow(H, temp, 50, False, None)
+    assert np.allclose( valores, [ ss.thermodynamic.entropy(ee, None, t, 50) for t in temp ] )
 
 def test_expected_value_workflow():
-    assert True
+    H, M = heisenberg_triangle()
+    ee, vv = np.linalg.eigh(H)
+    proy = np.array( [ vv[:,k].dot(M).dot(vv[:,k]) for k in range(len(ee)) ] )
+    valores = ss.thermodynamic.expected_value_workflow(H, M, temp, 50, False, None)
+    assert np.allclose( valores, [ ss.thermodynamic.valor_esperado(ee, proy, t, 50) for t in temp ] )
+
+def test_expected_value_workflow_mmap(tmp_path, monkeypatch):
+    espines = [ 0.5 ]*3
+    terminos = []
+    for op in ss.operators.set_sij_vector([ (0,1), (1,2), (0,2) ], 3):
+        terminos += [ [1.0, op[0]], [1.0, op[1]], [1.0, op[2]] ]
+    M = ss.hamiltonian.construct_sparse_term("ZII", espines)
+    valores = ss.thermodynamic.expected_value_workflow(ss.hamiltonian.construct_hamiltonian(terminos, espines), M, temp, 50, False, None)
+    ss.hamiltonian.construct_spectrum(terminos, espines, vectors_flag=True, store_dir=str(tmp_path))
+    espectro = ss.hamiltonian.construct_spectrum(terminos, espines, vectors_flag=True, store_dir=str(tmp_path), mmap_flag=True)
+    assert isinstance( espectro.vectors, np.memmap ) and espectro.vectors.flags.f_contiguous
+    # Bloques de una columna para recorrer los vectores desde disco
+    monkeypatch.setattr(ss.hamiltonian.build_spectrum, "block_bytes", 1)
+    stored = ss.thermodynamic.expected_value_workflow(espectro, M, temp, 50, False, None)
+    assert np.allclose( stored, valores )
 
 ##TESTEAR WORKFLOW EN PARALELO
+parallel_modes = [ { 'scheduler': 'threads', 'num_workers': 2 },
+    { 'scheduler': 'threads', 'num_workers': 2, 'mode': 'chunked' },
+    { 'scheduler': 'threads', 'num_workers': 3, 'mode': 'chunked', 'chunks': 7 } ]
+
 def test_parallel_specific_heat():
-    assert True
+    H, _ = heisenberg_triangle()
+    serial = ss.thermodynamic.specific_heat_workflow(H, temp, 50, False, None)
+    for params in parallel_modes:
+        assert np.allclose( ss.thermodynamic.specific_heat_workflow(H, temp, 50, True, params), serial )
 
 def test_parallel_entropy():
-    assert True
+    H, _ = heisenberg_triangle()
+    serial = ss.thermodynamic.entropy_workflow(H, temp, 50, False, None)
+    for params in parallel_modes:
+        assert np.allclose( ss.thermodynamic.entropy_workflow(H, temp, 50, True, params), serial )
 
 def test_parallel_magnetization():
-    assert True
+    H, M = heisenberg_triangle()
+    serial = ss.thermodynamic.expected_value_workflow(H, M, temp, 50, False, None)
+    for params in parallel_modes:
+        assert np.allclose( ss.thermodynamic.expected_value_workflow(H, M, temp, 50, True, params), serial )
+
+
+def test_block_workflows():
+    espines = [ 0.5, 1.0, 0.5 ]
+    terminos = []
+    for op in ss.operators.set_sij_vector([ (0,1), (1,2), (0,2) ], 3):
+        terminos += [ [1.0, op[0]], [1.0, op[1]], [0.5, op[2]] ]
+    H = ss.hamiltonian.construct_hamiltonian(terminos, espines)
+    B = ss.hamiltonian.construct_block_hamiltonian(terminos, espines)
+    M = ss.hamiltonian.construct_term("ZII", espines)
+    temp = np.linspace(1, 100, 5)*1e-4
+    assert np.allclose( ss.thermodynamic.specific_heat_workflow(B, temp, 50, False, None),
+        ss.thermodynamic.specific_heat_workflow(H, temp, 50, False, None) )
+    assert np.allclose( ss.thermodynamic.entropy_workflow(B, temp, 50, False, None),
+        ss.thermodynamic.entropy_workflow(H, temp, 50, False, None) )
+    assert np.allclose( ss.thermodynamic.expected_value_workflow(B, M, temp, 50, False, None),
+        ss.thermodynamic.expected_value_workflow(H, M, temp, 50, False, None) )
+
+
+
+def test_momentum_expected_value_real():
+    import warnings
+    size = 4
+    espines = [ 0.5 ]*size
+    terminos = []
+    for op in ss.operators.set_sij_vector([ (i, (i+1)%size) for i in range(size) ], size):
+        terminos += [ [1e-3, op[0]], [1e-3, op[1]], [1e-3, op[2]] ]
+    H = ss.hamiltonian.construct_hamiltonian(terminos, espines)
+    B = ss.hamiltonian.construct_block_hamiltonian(terminos, espines, translation_flag=True)
+    M = ss.hamiltonian.construct_term("ZZII", espines)
+    esperado = ss.thermodynamic.expected_value_workflow(H, M, temp, 50, False, None)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        serial = ss.thermodynamic.expected_value_workflow(B, M, temp, 50, False, None)
+        punto = ss.thermodynamic.expected_value_workflow(B, M, temp, 50, True, parallel_modes[0])
+    for valores in (serial, punto):
+        assert valores.dtype == np.float64
+        assert np.allclose( valores, esperado )
+
+def test_spectrum_cache(tmp_path):
+    espines = [ 0.5, 1.0, 0.5 ]
+    terminos = []
+    for op in ss.operators.set_sij_vector([ (0,1), (1,2), (0,2) ], 3):
+        terminos += [ [1.0, op[0]], [1.0, op[1]], [0.5, op[2]] ]
+    H = ss.hamiltonian.construct_hamiltonian(terminos, espines)
+    M = ss.hamiltonian.construct_term("ZII", espines)
+    temp = np.linspace(1, 100, 5)*1e-4
+
+    spectrum = ss.hamiltonian.construct_spectrum(terminos, espines, True, str(tmp_path))
+    loaded = ss.hamiltonian.construct_spectrum(terminos, espines, True, str(tmp_path), mmap_flag=True)
+    assert loaded.op is None and isinstance(loaded.vectors, np.memmap)
+    for S in [ spectrum, loaded, ss.hamiltonian.Spectrum(H) ]:
+        assert np.allclose( ss.thermodynamic.specific_heat_workflow(S, temp, 50, False, None),
+            ss.thermodynamic.specific_heat_workflow(H, temp, 50, False, None) )
+        assert np.allclose( ss.thermodynamic.expected_value_workflow(S, M, temp, 50, False, None),
+            ss.thermodynamic.expected_value_workflow(H, M, temp, 50, False, None) )
+
+    # Sin archivos temporales y con otra precision se usa otra llave
+    assert not any( p.name.endswith(".tmp") for p in tmp_path.iterdir() )
+    llave = ss.hamiltonian.spectrum_key(terminos, espines)
+    with ss.precision.precision_policy('float32'):
+        assert ss.hamiltonian.spectrum_key(terminos, espines) != llave
+        simple = ss.hamiltonian.construct_spectrum(terminos, espines, False, str(tmp_path))
+    assert simple.op is not None and simple.values.dtype == np.float32
+    assert len( list(tmp_path.iterdir()) ) == 3
+
+
+def test_compress_spectrum():
+    ee = np.array([-1.0, -1.0 + 1e-9, 0.0, 0.0, 0.0, 2.0])
+    proy = np.array([0.5, -0.5, 1.0, 1.0, 1.0, 3.0])
+    energias, multiplicidad, suma = ss.thermodynamic.compress_spectrum(ee, proy, 1e-7)
+    assert np.array_equal( multiplicidad, [2, 3, 1] )
+    assert np.allclose( energias, [-1.0, 0.0, 2.0] )
+    assert np.allclose( suma, [0.0, 3.0, 3.0] )
+
+    # Con energias exactamente degeneradas el resultado no cambia
+    ee = np.array([-1.0, -1.0, 0.0, 0.0, 0.0, 2.0])
+    valores = ss.thermodynamic.thermal_quantities(ee, temp*1e2, proy)
+    comprimido = ss.thermodynamic.thermal_quantities(energias, temp*1e2, suma, degeneracy=multiplicidad)
+    for name in valores:
+        assert np.allclose( valores[name], comprimido[name] )
+
+
+def test_compressed_workflows():
+    H, M = heisenberg_triangle()
+    for parallel_flag in [False, True]:
+        params = { 'scheduler': 'threads', 'num_workers': 2 }
+        assert np.allclose( ss.thermodynamic.specific_heat_workflow(H, temp, 50, parallel_flag, params, 1e-9),
+            ss.thermodynamic.specific_heat_workflow(H, temp, 50, False, None) )
+        assert np.allclose( ss.thermodynamic.entropy_workflow(H, temp, 50, parallel_flag, params, 1e-9),
+            ss.thermodynamic.entropy_workflow(H, temp, 50, False, None) )
+        assert np.allclose( ss.thermodynamic.expected_value_workflow(H, M, temp, 50, parallel_flag, params, 1e-9),
+            ss.thermodynamic.expected_value_workflow(H, M, temp, 50, False, None) )
+
+
+def test_sweep_workflow(tmp_path):
+    espines = [ 0.5, 1.0, 0.5 ]
+    terminos = []
+    for J, op in zip([ "J1", "J2", 1e-3 ], ss.operators.set_sij_vector([ (0,1), (1,2), (0,2) ], 3)):
+        terminos += [ [J, op[0]], [J, op[1]], [J, op[2]] ]
+    terminos += [ [ "h", op ] for op in ss.operators.magnetic_vector(3)[2] ]
+    M = ss.hamiltonian.construct_term("ZII", espines)
+    puntos = [ { "J1": j, "J2": -j, "h": h } for j in [1e-3, 2e-3] for h in [0.0, 1e-4] ]
+
+    params = { 'scheduler': 'threads', 'num_workers': 2 }
+    resultado = ss.thermodynamic.sweep_workflow(terminos, espines, puntos, temp, ["specific_heat", "entropy"],
+        { "mz": M }, True, params, str(tmp_path))
+    assert resultado["values"].shape == (4, 3, temp.shape[0])
+    assert resultado["labels"] == ["specific_heat", "entropy", "mz"]
+
+    for punto, valores in zip(puntos, resultado["values"]):
+        H = ss.hamiltonian.construct_hamiltonian([ [punto[J] if isinstance(J, str) else J, op] for J, op in terminos ], espines)
+        assert np.allclose( valores[0], ss.thermodynamic.specific_heat_workflow(H, temp, 50, False, None) )
+        assert np.allclose( valores[2], ss.thermodynamic.expected_value_workflow(H, M, temp, 50, False, None) )
+
+    # Al retomar el barrido se leen los checkpoints
+    assert len( list(tmp_path.iterdir()) ) == 4
+    retomado = ss.thermodynamic.sweep_workflow(terminos, espines, puntos, temp, ["specific_heat", "entropy"], { "mz": M },
+        checkpoint_dir=str(tmp_path))
+    assert np.array_equal( retomado["values"], resultado["values"] )
+
+    # Con otras temperaturas, observables o terminos los checkpoints no se usan
+    otras = np.linspace(1, 100, 9)
+    cambiado = ss.thermodynamic.sweep_workflow(terminos, espines, puntos[:1], otras, ["specific_heat", "entropy"],
+        checkpoint_dir=str(tmp_path))
+    assert cambiado["values"].shape == (1, 2, 9)
+    campo = terminos + [ [1e-3, "ZII"] ]
+    cambiado = ss.thermodynamic.sweep_workflow(campo, espines, puntos[:1], otras, ["specific_heat", "entropy"],
+        checkpoint_dir=str(tmp_path))
+    H = ss.hamiltonian.construct_hamiltonian([ [puntos[0][J] if isinstance(J, str) else J, op] for J, op in campo ], espines)
+    assert np.allclose( cambiado["values"][0][0], ss.thermodynamic.specific_heat_workflow(H, otras, 50, False, None) )
+
+    # Un checkpoint incompleto se recalcula
+    with open(tmp_path / "point_0.npz", "wb") as f:
+        f.write(b"PK")
+    retomado = ss.thermodynamic.sweep_workflow(terminos, espines, puntos, temp, ["specific_heat", "entropy"], { "mz": M },
+        checkpoint_dir=str(tmp_path))
+    assert np.allclose( retomado["values"], resultado["values"] )
+    assert not any( p.name.endswith(".tmp") for p in tmp_path.iterdir() )
+
+
+def test_expected_values_workflow():
+    H, M = heisenberg_triangle()
+    espines = [ 0.5, 1.0, 0.5 ]
+    operadores = [ M, ss.hamiltonian.construct_sparse_term("IZI", espines), "IIZ", "ZZI" ]
+    serial = ss.thermodynamic.expected_values_workflow(H, operadores, temp, 50, False, None, spins=espines)
+    assert serial.shape == (4, temp.shape[0])
+    for fila, op in zip(serial, operadores):
+        if isinstance(op, str):
+            op = ss.hamiltonian.construct_term(op, espines)
+        assert np.allclose( fila, ss.thermodynamic.expected_value_workflow(H, op, temp, 50, False, None) )
+
+    params = { 'scheduler': 'threads', 'num_workers': 2 }
+    paralelo = ss.thermodynamic.expected_values_workflow(H, operadores, temp, 50, True, params, 1e-9, espines)
+    assert np.allclose( paralelo, serial )
+
+
+def test_kpm_workflows():
+    size = 8
+    terminos = []
+    for op in ss.operators.set_sij_vector([ (i, (i+1)%size) for i in range(size) ], size):
+        terminos += [ [1e-3, op[0]], [1e-3, op[1]], [1e-3, op[2]] ]
+    H = ss.hamiltonian.construct_hamiltonian(terminos, [0.5]*size, sparse_flag=True)
+    L = ss.hamiltonian.construct_linear_operator(terminos, [0.5]*size)
+    t = np.linspace(10, 60, 6)
+
+    energias, pesos, dos = ss.thermodynamic.kpm_density_of_states(L, 128, 8, seed=0)
+    assert np.abs( np.sum(pesos) - H.shape[0] ) <= 1e-6*H.shape[0]
+    calor = ss.thermodynamic.kpm_specific_heat_workflow(L, t, 256, 32, seed=1)
+    entropia = ss.thermodynamic.kpm_entropy_workflow(H, t, 256, 32, seed=1)
+    assert calor.shape == t.shape
+    assert np.allclose( calor, ss.thermodynamic.specific_heat_workflow(H, t, 50, False, None), rtol=5e-2 )
+    assert np.allclose( entropia, ss.thermodynamic.entropy_workflow(H, t, 50, False, None), rtol=5e-2 )
+
+
+def test_ftlm_expected_value_workflow():
+    size = 8
+    espines = [ 0.5 ]*size
+    terminos = []
+    for op in ss.operators.set_sij_vector([ (i, (i+1)%size) for i in range(size) ], size):
+        terminos += [ [1e-3, op[0]], [1e-3, op[1]], [1e-3, op[2]] ]
+    terminos += [ [5e-4, op] for op in ss.operators.magnetic_vector(size)[2] ]
+    H = ss.hamiltonian.construct_hamiltonian(terminos, espines, sparse_flag=True)
+    L = ss.hamiltonian.construct_linear_operator(terminos, espines)
+    M = ss.hamiltonian.construct_hamiltonian([ [1.0, op] for op in ss.operators.magnetic_vector(size)[2] ], espines, sparse_flag=True)
+    t = np.linspace(5, 60, 6)
+
+    exacto = ss.thermodynamic.expected_value_workflow(H, M, t, 50, False, None)
+    valores, errores = ss.thermodynamic.ftlm_expected_value_workflow(L, M, t, 24, 40, seed=3)
+    assert valores.shape == errores.shape == t.shape
+    assert np.all( np.abs(valores - exacto) <= 4*errores + 1e-2*np.abs(exacto) )
+
+    params = { 'scheduler': 'threads', 'num_workers': 2 }
+    paralelo, _ = ss.thermodynamic.ftlm_expected_value_workflow(L, M, t, 24, 40, 3, True, params)
+    assert np.allclose( paralelo, valores )
+
+
+def test_error_state_unchanged():
+    estado = np.geterr()
+    ss.thermodynamic.prob_states(ee_two, 1.0, 50)
+    ss.thermodynamic.log_z_function(ee_two, 1.0, 50, np.array([1e308, 1e308]))
+    ss.information.von_neumann_entropy( np.array([0.5, 0.5]) )
+    assert np.geterr() == estado
+
+
+def test_single_precision_workflows():
+    H, M = heisenberg_triangle()
+    calor = ss.thermodynamic.specific_heat_workflow(H, temp, 50, False, None)
+    valores = ss.thermodynamic.expected_value_workflow(H, M, temp, 50, False, None)
+    with ss.precision.precision_policy('float32', 'float64'):
+        calor_32 = ss.thermodynamic.specific_heat_workflow(H.astype(np.float32), temp, 50, False, None)
+        valores_32 = ss.thermodynamic.expected_value_workflow(H.astype(np.float32), M.astype(np.float32), temp, 50, False, None)
+        assert calor_32.dtype == np.float64
+    assert np.allclose( calor_32, calor, rtol=1e-3, atol=1e-9 )
+    assert np.allclose( valores_32, valores, rtol=1e-3, atol=1e-6 )
+
 
+def test_ftlm_single_vector():
+    H, M = heisenberg_triangle()
+    with pytest.raises(ValueError):
+        ss.thermodynamic.ftlm_expected_value_workflow(H, M, temp, n_vectors=1, n_steps=4)